@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 from decimal import Decimal
-from typing import Any, Dict
+from typing import Any, Dict, List
 
 from apps.clientes.models import Cliente, Endereco
 from apps.produtos.models import Produto
@@ -11,6 +11,13 @@ from .choices import FORMA_PAGAMENTO_CHOICES, OUTROS
 from .models import Compra
 
 
+def _normalizar_forma(dto: Dict[str, Any]) -> str:
+    forma = (dto.get("forma_pagamento") or OUTROS).upper()
+    if forma not in dict(FORMA_PAGAMENTO_CHOICES):
+        forma = OUTROS
+    return forma
+
+
 @transaction.atomic
 def persist_compra_from_dto(dto: Dict[str, Any]) -> Compra:
     """
@@ -63,9 +70,7 @@ def persist_compra_from_dto(dto: Dict[str, Any]) -> Compra:
 
     # ----- Compra (idempotência) -----
     id_mensagem = dto["id_mensagem"]
-    forma = (dto.get("forma_pagamento") or OUTROS).upper()
-    if forma not in dict(FORMA_PAGAMENTO_CHOICES):
-        forma = OUTROS
+    forma = _normalizar_forma(dto)
 
     try:
         compra, created = Compra.objects.get_or_create(
@@ -84,3 +89,136 @@ def persist_compra_from_dto(dto: Dict[str, Any]) -> Compra:
     except IntegrityError:
         # Caso de corrida raro: alguém gravou a mesma id_mensagem no intervalo
         return Compra.objects.get(id_mensagem=id_mensagem)
+
+
+def _resolver_clientes(dados: List[Dict[str, Any]]) -> List[Cliente]:
+    """
+    Resolve (ou cria) os clientes de vários DTOs com buscas em lote.
+    Mesmas regras do fluxo unitário: por cpf_cnpj, senão por (nome, email).
+    """
+    # ----- Com documento: o último dado do lote prevalece nas atualizações -----
+    com_doc = {c["cpf_cnpj"]: c for c in dados if c.get("cpf_cnpj")}
+    por_doc = Cliente.objects.in_bulk(list(com_doc), field_name="cpf_cnpj")
+    faltando = [
+        Cliente(
+            cpf_cnpj=doc,
+            nome=c["nome"],
+            email=c.get("email") or None,
+            telefone=c.get("telefone") or None,
+        )
+        for doc, c in com_doc.items() if doc not in por_doc
+    ]
+    if faltando:
+        Cliente.objects.bulk_create(faltando, ignore_conflicts=True)
+        por_doc = Cliente.objects.in_bulk(list(com_doc), field_name="cpf_cnpj")
+
+    alterados = []
+    for doc, c in com_doc.items():
+        cliente = por_doc[doc]
+        changed = False
+        if c.get("email") and c["email"] != (cliente.email or ""):
+            cliente.email = c["email"]
+            changed = True
+        if c.get("telefone") and c["telefone"] != (cliente.telefone or ""):
+            cliente.telefone = c["telefone"]
+            changed = True
+        if c["nome"] and c["nome"] != cliente.nome:
+            cliente.nome = c["nome"]
+            changed = True
+        if changed:
+            alterados.append(cliente)
+    if alterados:
+        Cliente.objects.bulk_update(alterados, ["nome", "email", "telefone"])
+
+    # ----- Sem documento: fallback por (nome, email) -----
+    sem_doc = {
+        (c["nome"], c.get("email") or None): c
+        for c in dados if not c.get("cpf_cnpj")
+    }
+
+    def _buscar_sem_doc():
+        nomes = {nome for nome, _ in sem_doc}
+        encontrados = {}
+        for cliente in Cliente.objects.filter(nome__in=nomes).order_by("-id"):
+            encontrados[(cliente.nome, cliente.email)] = cliente
+        return encontrados
+
+    por_nome_email = _buscar_sem_doc() if sem_doc else {}
+    faltando = [
+        Cliente(nome=nome, email=email, telefone=c.get("telefone") or None)
+        for (nome, email), c in sem_doc.items() if (nome, email) not in por_nome_email
+    ]
+    if faltando:
+        Cliente.objects.bulk_create(faltando, ignore_conflicts=True)
+        por_nome_email = _buscar_sem_doc()
+
+    return [
+        por_doc[c["cpf_cnpj"]] if c.get("cpf_cnpj")
+        else por_nome_email[(c["nome"], c.get("email") or None)]
+        for c in dados
+    ]
+
+
+def _resolver_produtos(nomes: set) -> Dict[str, Produto]:
+    por_nome = Produto.objects.in_bulk(list(nomes), field_name="nome")
+    faltando = [Produto(nome=n) for n in nomes if n not in por_nome]
+    if faltando:
+        Produto.objects.bulk_create(faltando, ignore_conflicts=True)
+        por_nome = Produto.objects.in_bulk(list(nomes), field_name="nome")
+    return por_nome
+
+
+@transaction.atomic
+def persist_compras_em_lote(dtos: List[Dict[str, Any]]) -> int:
+    """
+    Persiste várias compras (DTOs do workers.parsers) numa única transação,
+    com buscas em lote e bulk_create. Compras cujo id_mensagem já existe são
+    ignoradas. Retorna quantas compras novas foram gravadas.
+    """
+    por_chave: Dict[str, Dict[str, Any]] = {}
+    for dto in dtos:
+        por_chave.setdefault(dto["id_mensagem"], dto)
+
+    existentes = set(
+        Compra.objects.filter(id_mensagem__in=list(por_chave))
+        .values_list("id_mensagem", flat=True)
+    )
+    novos = [dto for chave, dto in por_chave.items() if chave not in existentes]
+    if not novos:
+        return 0
+
+    clientes = _resolver_clientes([dto["cliente"] for dto in novos])
+
+    # ----- Endereços (opcionais) -----
+    enderecos = {
+        (cliente.id, (dto["cliente"].get("endereco_completo") or "").strip())
+        for dto, cliente in zip(novos, clientes)
+    }
+    Endereco.objects.bulk_create(
+        [Endereco(cliente_id=cid, endereco_completo=texto)
+         for cid, texto in enderecos if texto],
+        ignore_conflicts=True,
+    )
+
+    produtos = _resolver_produtos({dto["produto"]["nome"] for dto in novos})
+
+    compras = [
+        Compra(
+            cliente=cliente,
+            produto=produtos[dto["produto"]["nome"]],
+            quantidade=int(dto["quantidade"]),
+            preco_unitario=Decimal(dto["valor_unitario"]),
+            valor_total=Decimal(dto["valor_total"]),
+            forma_pagamento=_normalizar_forma(dto),
+            data_hora=dto["data_hora"],
+            id_mensagem=dto["id_mensagem"],
+        )
+        for dto, cliente in zip(novos, clientes)
+    ]
+    # ignore_conflicts cobre a corrida rara de outra task gravar a mesma id_mensagem
+    Compra.objects.bulk_create(compras, ignore_conflicts=True, batch_size=1000)
+    # Com ignore_conflicts o bulk_create não diz quais linhas entraram: conta
+    # as chaves que existem agora (nenhuma existia na consulta acima). Na
+    # corrida, a linha gravada pela outra task entra nas duas contagens
+    return Compra.objects.filter(
+        id_mensagem__in=[c.id_mensagem for c in compras]).count()
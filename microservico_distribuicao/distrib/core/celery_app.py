@@ -1,10 +1,14 @@
 import os
 
 from celery import Celery
+from workers.codec import register_serializer
 
 # Garantia que o Django settings esteja visível ao Celery
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings")
 
+# Formato binário da ingestão (CELERY_ACCEPT_CONTENT lista o content type)
+register_serializer()
+
 celery_app = Celery("distrib")
 
 # Lê configurações do Django (definir as CELERY_* no settings)
@@ -0,0 +1,86 @@
+"""
+Formato binário das mensagens de processed_data (msgpack + zlib opcional).
+
+Cópia idêntica (fora este parágrafo) de
+microservico_ingestao/app/tasks/codec.py: qualquer mudança no formato precisa
+ser feita nos dois arquivos; o vetor de teste em
+microservico_ingestao/tests/test_codec.py fixa os bytes.
+
+Corpo: 1 byte de cabeçalho (0 = msgpack, 1 = msgpack comprimido com zlib)
+seguido do msgpack. Tipos estendidos sem perda:
+  1 Decimal  -> str(Decimal) em ASCII
+  2 datetime -> >qi: microssegundos desde a época (UTC se aware, relógio
+                local se naive) + offset em segundos (NAIVE se sem fuso)
+"""
+import struct
+import zlib
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+import msgpack
+from kombu.serialization import register
+
+NAME = "ingest-msgpack"
+CONTENT_TYPE = "application/x-ingest-msgpack"
+
+_RAW, _ZLIB = b"\x00", b"\x01"
+_EXT_DECIMAL, _EXT_DATETIME = 1, 2
+_DATETIME = struct.Struct(">qi")
+_NAIVE = -2**31
+_EPOCH = datetime(1970, 1, 1)
+_EPOCH_UTC = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def _micros(delta: timedelta) -> int:
+    return (delta.days * 86_400 + delta.seconds) * 1_000_000 + delta.microseconds
+
+
+def _default(obj):
+    if isinstance(obj, Decimal):
+        return msgpack.ExtType(_EXT_DECIMAL, str(obj).encode("ascii"))
+    if isinstance(obj, datetime):
+        if obj.tzinfo is None:
+            return msgpack.ExtType(_EXT_DATETIME, _DATETIME.pack(
+                _micros(obj - _EPOCH), _NAIVE))
+        offset = obj.utcoffset()
+        return msgpack.ExtType(_EXT_DATETIME, _DATETIME.pack(
+            _micros(obj - _EPOCH_UTC), offset.days * 86_400 + offset.seconds))
+    raise TypeError(f"Tipo não serializável: {type(obj).__name__}")
+
+
+def _ext_hook(code: int, data: bytes):
+    if code == _EXT_DECIMAL:
+        return Decimal(data.decode("ascii"))
+    if code == _EXT_DATETIME:
+        us, offset = _DATETIME.unpack(data)
+        if offset == _NAIVE:
+            return _EPOCH + timedelta(microseconds=us)
+        return (_EPOCH_UTC + timedelta(microseconds=us)).astimezone(
+            timezone(timedelta(seconds=offset)))
+    return msgpack.ExtType(code, data)
+
+
+def encode(obj, compress_min_bytes: int = 4096) -> bytes:
+    # Comprime (zlib nível 1) quando o msgpack passa de compress_min_bytes
+    body = msgpack.packb(obj, default=_default, use_bin_type=True)
+    if 0 < compress_min_bytes <= len(body):
+        return _ZLIB + zlib.compress(body, 1)
+    return _RAW + body
+
+
+def decode(data: bytes | memoryview | str):
+    if isinstance(data, str):
+        data = data.encode("latin-1")
+    data = bytes(data)
+    header, body = data[:1], data[1:]
+    if header == _ZLIB:
+        body = zlib.decompress(body)
+    elif header != _RAW:
+        raise ValueError(f"Cabeçalho desconhecido: {header!r}")
+    return msgpack.unpackb(body, ext_hook=_ext_hook, raw=False, strict_map_key=False)
+
+
+def register_serializer(compress_min_bytes: int = 4096):
+    # Registra o formato no kombu (nome NAME / content type CONTENT_TYPE)
+    register(NAME, lambda obj: encode(obj, compress_min_bytes), decode,
+             content_type=CONTENT_TYPE, content_encoding="binary")
@@ -17,6 +17,11 @@ def _only_digits(s: str | None):
     return _CLEAN_DIGITS.sub("", s)
 
 
+def _decimal(valor):
+    # Formato binário já traz Decimal; JSON traz float/texto
+    return valor if isinstance(valor, Decimal) else Decimal(str(valor))
+
+
 def parse_payload(payload: dict | str):
     # Normaliza o JSON de entrada no formato interno (DTO).
 
@@ -46,8 +51,8 @@ def parse_payload(payload: dict | str):
         raise ValueError("quantidade inválida (inteiro > 0 esperado)")
 
     try:
-        valor_unitario = Decimal(str(data.get("valor_unitario")))
-        valor_total = Decimal(str(data.get("valor_total")))
+        valor_unitario = _decimal(data.get("valor_unitario"))
+        valor_total = _decimal(data.get("valor_total"))
     except (InvalidOperation, TypeError):
         raise ValueError(
             "valor_unitario/valor_total inválido (Decimal esperado)")
@@ -58,7 +63,9 @@ def parse_payload(payload: dict | str):
         raise ValueError("data_hora ausente")
 
     try:
-        dt = datetime.fromisoformat(str(raw_dt).replace("Z", "+00:00"))
+        # Formato binário já traz datetime; JSON traz texto ISO-8601
+        dt = raw_dt if isinstance(raw_dt, datetime) else datetime.fromisoformat(
+            str(raw_dt).replace("Z", "+00:00"))
         data_hora = dt if dt.tzinfo else timezone.make_aware(
             dt, timezone.get_current_timezone())
     except Exception:
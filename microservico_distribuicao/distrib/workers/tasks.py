@@ -1,7 +1,8 @@
 import json
 import logging
 
-from apps.vendas.services import persist_compra_from_dto
+from apps.vendas.services import (persist_compra_from_dto,
+                                  persist_compras_em_lote)
 from celery import shared_task
 
 from .idempotency import make_idempotency_key
@@ -57,6 +58,44 @@ def persist_processed_data(payload: dict | str):
         raise
 
 
+@shared_task(name="workers.tasks.persist_processed_batch")
+def persist_processed_batch(payloads: list[dict | str]):
+    """
+    Persiste um lote de compras publicado pela ingestão numa única transação.
+    Payloads inválidos são descartados (com log) sem derrubar o lote.
+    """
+    dtos = []
+    invalidos = 0
+    for payload in payloads:
+        try:
+            data = json.loads(payload) if isinstance(payload, str) else payload
+            dto = parse_payload(data)
+            dto["id_mensagem"] = make_idempotency_key(dto)
+            dtos.append(dto)
+        except Exception as exc:
+            invalidos += 1
+            logger.warning("Payload inválido descartado do lote: %s", exc)
+
+    try:
+        criadas = persist_compras_em_lote(dtos)
+    except Exception as exc:
+        logger.exception(
+            "Falha ao persistir lote de processed_data (%s compras): %s", len(dtos), exc)
+        raise
+
+    logger.info(
+        "Lote persistido. recebidas=%s criadas=%s duplicadas=%s invalidas=%s",
+        len(payloads), criadas, len(dtos) - criadas, invalidos,
+    )
+    return {
+        "status": "ok",
+        "recebidas": len(payloads),
+        "criadas": criadas,
+        "duplicadas": len(dtos) - criadas,
+        "invalidas": invalidos,
+    }
+
+
 # Alias/compat: delega para a task principal
 @shared_task(name="tasks.publisher.send_to_queue")
 def receive_from_ingest(payload: dict | str):
@@ -0,0 +1,103 @@
+import csv
+import io
+from datetime import datetime
+from typing import AsyncIterator
+
+import orjson
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models.temp_models import ClienteTemp, CompraTemp, ProdutoTemp
+from sqlalchemy import select
+
+CSV_COLUMNS = (
+    "id", "cliente_id", "cliente_nome", "cliente_email", "cliente_telefone",
+    "cliente_cpf_cnpj", "cliente_endereco_completo", "produto_id",
+    "produto_nome", "quantidade", "valor_unitario", "valor_total",
+    "data_hora", "forma_pagamento", "lote_id", "publicado_em",
+)
+
+
+def _consulta_compras(data_hora_inicio: datetime | None, data_hora_fim: datetime | None):
+    # Colunas planas (sem ORM): menos alocação por linha no streaming
+    stmt = (
+        select(
+            CompraTemp.id,
+            ClienteTemp.id.label("cliente_id"),
+            ClienteTemp.nome.label("cliente_nome"),
+            ClienteTemp.email.label("cliente_email"),
+            ClienteTemp.telefone.label("cliente_telefone"),
+            ClienteTemp.cpf_cnpj.label("cliente_cpf_cnpj"),
+            ClienteTemp.endereco_completo.label("cliente_endereco_completo"),
+            ProdutoTemp.id.label("produto_id"),
+            ProdutoTemp.nome_produto.label("produto_nome"),
+            CompraTemp.quantidade,
+            CompraTemp.valor_unitario,
+            CompraTemp.valor_total,
+            CompraTemp.data_hora,
+            CompraTemp.forma_pagamento,
+            CompraTemp.lote_id,
+            CompraTemp.publicado_em,
+        )
+        .join(ClienteTemp, CompraTemp.cliente_id == ClienteTemp.id)
+        .join(ProdutoTemp, CompraTemp.produto_id == ProdutoTemp.id)
+        .order_by(CompraTemp.id)
+        .execution_options(yield_per=settings.export_chunk_size)
+    )
+    if data_hora_inicio is not None:
+        stmt = stmt.where(CompraTemp.data_hora >= data_hora_inicio)
+    if data_hora_fim is not None:
+        stmt = stmt.where(CompraTemp.data_hora < data_hora_fim)
+    return stmt
+
+
+async def _blocos_compras(data_hora_inicio, data_hora_fim) -> AsyncIterator[list]:
+    """Lê as compras por cursor no servidor, um bloco de export_chunk_size por vez"""
+    # Sessão própria: vive enquanto a resposta é transmitida
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(_consulta_compras(data_hora_inicio, data_hora_fim))
+        async for bloco in result.partitions():
+            yield bloco
+
+
+async def gerar_ndjson(data_hora_inicio=None, data_hora_fim=None) -> AsyncIterator[bytes]:
+    """Uma compra por linha, no mesmo formato de GET /compras"""
+    async for bloco in _blocos_compras(data_hora_inicio, data_hora_fim):
+        yield b"".join(
+            orjson.dumps({
+                "id": r.id,
+                "cliente": {
+                    "id": r.cliente_id,
+                    "nome": r.cliente_nome,
+                    "email": r.cliente_email,
+                    "telefone": r.cliente_telefone,
+                    "cpf_cnpj": r.cliente_cpf_cnpj,
+                    "endereco_completo": r.cliente_endereco_completo,
+                },
+                "produto": {"id": r.produto_id, "nome_produto": r.produto_nome},
+                "quantidade": r.quantidade,
+                "valor_unitario": r.valor_unitario,
+                "valor_total": r.valor_total,
+                "data_hora": r.data_hora,
+                "forma_pagamento": r.forma_pagamento,
+                "lote_id": r.lote_id,
+                "publicado_em": r.publicado_em,
+            }, option=orjson.OPT_APPEND_NEWLINE)
+            for r in bloco
+        )
+
+
+async def gerar_csv(data_hora_inicio=None, data_hora_fim=None) -> AsyncIterator[str]:
+    """CSV com cabeçalho e colunas planas (CSV_COLUMNS)"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_COLUMNS)
+    yield buffer.getvalue()
+
+    async for bloco in _blocos_compras(data_hora_inicio, data_hora_fim):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(
+            tuple(v.isoformat() if isinstance(v, datetime) else v for v in r)
+            for r in bloco
+        )
+        yield buffer.getvalue()
@@ -0,0 +1,35 @@
+from typing import Sequence
+
+from app.core.config import settings
+from fastapi import Query, Response
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+class Paginacao:
+    """
+    Parâmetros de paginação por cursor (keyset em id): devolve itens com
+    id > cursor, em ordem de id. O próximo cursor vai no header X-Next-Cursor.
+    """
+
+    def __init__(
+        self,
+        cursor: int | None = Query(
+            None, ge=0, description="Último id da página anterior"),
+        limit: int = Query(
+            settings.page_size_default, ge=1, le=settings.page_size_max,
+            description="Itens por página"),
+    ):
+        self.cursor = cursor
+        self.limit = limit
+
+    def aplicar(self, stmt, coluna_id):
+        if self.cursor is not None:
+            stmt = stmt.where(coluna_id > self.cursor)
+        return stmt.order_by(coluna_id).limit(self.limit)
+
+    def responder(self, response: Response, itens: Sequence) -> Sequence:
+        # Página cheia: pode haver mais itens depois do último id
+        if len(itens) == self.limit:
+            response.headers[NEXT_CURSOR_HEADER] = str(itens[-1].id)
+        return itens
@@ -59,3 +59,47 @@ class CompraCreate(BaseModel):
     quantidade: int
     valor_unitario: float
     forma_pagamento: str
+    # Momento da venda na origem; sem ele vale o horário de recebimento
+    # (e reenvios da mesma venda não são reconhecidos como duplicados)
+    data_hora: datetime | None = None
+
+
+class CompraLoteItemResult(BaseModel):
+    indice: int
+    status: str  # "criada" | "rejeitada" | "duplicada"
+    id: int | None = None
+    erro: str | None = None
+
+
+class CompraLoteResponse(BaseModel):
+    recebidas: int
+    criadas: int
+    rejeitadas: int
+    duplicadas: int = 0
+    resultados: list[CompraLoteItemResult]
+
+
+class UploadResponse(BaseModel):
+    id: str
+    status: str
+    arquivo: str
+
+
+class UploadStatus(BaseModel):
+    id: str
+    arquivo: str | None = None
+    origem: str | None = None
+    status: str
+    etapa: str | None = None
+    linhas_processadas: int = 0
+    linhas_rejeitadas: int = 0
+    compras: int = 0
+    duplicadas: int = 0
+    tentativas: int = 0
+    # Linhas rejeitadas disponíveis em GET /uploads/{id}/quarentena
+    quarentena: bool = False
+    linhas_por_segundo: float | None = None
+    erro: str | None = None
+    criado_em: datetime
+    iniciado_em: datetime | None = None
+    finalizado_em: datetime | None = None
@@ -0,0 +1,102 @@
+import os
+import time
+import uuid
+from datetime import datetime
+from typing import BinaryIO
+
+from app.core.config import settings
+from app.models.temp_models import LoteIngestao
+from app.workers.arquivos import (EXTENSOES_SUPORTADAS, UPLOADS_PATH,
+                                  extensao_suportada)
+from app.workers.pool import PoolIngestao
+
+
+class UploadInvalido(ValueError):
+    pass
+
+
+def extensao_upload(nome: str | None) -> str:
+    ext = extensao_suportada(nome or "")
+    if ext is None:
+        raise UploadInvalido(
+            f"Extensão não suportada: {nome}; use {', '.join(EXTENSOES_SUPORTADAS)}")
+    return ext
+
+
+def gravar_upload(origem: BinaryIO, ext: str) -> str:
+    """
+    Copia o upload para UPLOADS_PATH em blocos de upload_chunk_size, sem
+    carregar o arquivo em memória. Grava como ".part" (o nome final é dado
+    depois de criado o lote); passa de upload_max_mb -> UploadInvalido.
+    """
+    limite = settings.upload_max_mb * 1024 * 1024
+    destino = os.path.join(UPLOADS_PATH, f"{uuid.uuid4().hex}{ext}.part")
+    tamanho = 0
+    try:
+        with open(destino, "wb") as f:
+            while bloco := origem.read(settings.upload_chunk_size):
+                tamanho += len(bloco)
+                if tamanho > limite:
+                    raise UploadInvalido(
+                        f"Arquivo maior que {settings.upload_max_mb} MB")
+                f.write(bloco)
+    except BaseException:
+        os.remove(destino)
+        raise
+    return destino
+
+
+def publicar_upload(parcial: str, lote_id: str, ext: str) -> str:
+    """Renomeia o ".part" para o id do lote (rename atômico na mesma pasta)"""
+    path = os.path.join(UPLOADS_PATH, f"{lote_id}{ext}")
+    os.replace(parcial, path)
+    return path
+
+
+def _vazao(linhas: int | None, inicio: float | None, fim: float | None) -> float | None:
+    if not linhas or inicio is None or fim is None or fim <= inicio:
+        return None
+    return round(linhas / (fim - inicio), 1)
+
+
+def status_upload(lote: LoteIngestao, pool: PoolIngestao | None) -> dict:
+    """
+    Estado do job: o lote no banco muda a cada bloco confirmado; enquanto o
+    arquivo está no pool o progresso vem da memória do pool (mais recente).
+    """
+    dados = {
+        "id": lote.id,
+        "arquivo": lote.arquivo,
+        "origem": lote.origem,
+        "status": lote.status,
+        "linhas_processadas": lote.linhas_processadas or 0,
+        "linhas_rejeitadas": lote.linhas_rejeitadas or 0,
+        "compras": lote.total_compras or 0,
+        "duplicadas": lote.compras_duplicadas or 0,
+        "erro": lote.erro,
+        "tentativas": lote.tentativas or 0,
+        "quarentena": lote.arquivo_quarentena is not None,
+        "criado_em": lote.criado_em,
+        "iniciado_em": lote.iniciado_em,
+        "finalizado_em": lote.finalizado_em,
+    }
+
+    ao_vivo = pool.progresso_lote(lote.id) if pool else None
+    if lote.status in ("pendente", "processando") and ao_vivo:
+        iniciado = ao_vivo.get("iniciado_em")
+        dados.update(
+            status=ao_vivo["estado"],
+            etapa=ao_vivo.get("etapa"),
+            linhas_processadas=ao_vivo.get("linhas", 0),
+            linhas_rejeitadas=ao_vivo.get("rejeitadas", 0),
+            compras=ao_vivo.get("compras", 0),
+            duplicadas=ao_vivo.get("duplicadas", 0),
+            erro=ao_vivo.get("erro"),
+            iniciado_em=datetime.fromtimestamp(iniciado) if iniciado else None,
+            linhas_por_segundo=_vazao(ao_vivo.get("linhas"), iniciado, time.time()),
+        )
+    elif lote.iniciado_em and lote.finalizado_em:
+        dados["linhas_por_segundo"] = _vazao(
+            lote.linhas_processadas, lote.iniciado_em.timestamp(),
+            lote.finalizado_em.timestamp())
+    return dados
@@ -1,16 +1,87 @@
-from sqlalchemy import create_engine
+from functools import lru_cache
+
+from sqlalchemy import create_engine, inspect, make_url, text
+from sqlalchemy.ext.asyncio import (AsyncSession, async_sessionmaker,
+                                    create_async_engine)
 from sqlalchemy.orm import sessionmaker, declarative_base
 from app.core.config import settings
 
+# Driver assíncrono equivalente ao driver síncrono da DATABASE_URL
+ASYNC_DRIVERS = {"postgresql": "postgresql+asyncpg", "sqlite": "sqlite+aiosqlite"}
+
+
+def _async_url(url: str) -> str:
+    u = make_url(url)
+    return u.set(drivername=ASYNC_DRIVERS.get(u.get_backend_name(), u.drivername)).render_as_string(hide_password=False)
+
+
 # Engine do SQLAlchemy (usa DATABASE_URL do ambiente ou .env)
-engine = create_engine(settings.database_url, pool_pre_ping=True)
+engine = create_engine(
+    settings.database_url, pool_pre_ping=True,
+    pool_size=settings.db_pool_size, max_overflow=settings.db_max_overflow)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
-def get_db():
-    db = SessionLocal()
-    try:
+
+@lru_cache(maxsize=1)
+def _fabrica_async() -> async_sessionmaker:
+    # Engine assíncrona para os endpoints da API (o watcher segue síncrono),
+    # criada no primeiro uso: só quem abre sessão assíncrona precisa do driver
+    # (asyncpg/aiosqlite)
+    async_engine = create_async_engine(
+        settings.async_database_url or _async_url(settings.database_url),
+        pool_pre_ping=True,
+        pool_size=settings.db_pool_size, max_overflow=settings.db_max_overflow)
+    return async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+
+def AsyncSessionLocal() -> AsyncSession:
+    return _fabrica_async()()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
+
+
+def init_db():
+    """
+    Cria tabelas, colunas e índices que ainda não existem no banco.
+    O serviço não usa migrações: colunas novas (anuláveis) são adicionadas
+    com ALTER TABLE para bancos criados por versões anteriores.
+    """
+    import app.models.temp_models  # noqa: F401  (registra os modelos no Base)
+
+    Base.metadata.create_all(bind=engine)
+
+    insp = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            existentes = {c["name"] for c in insp.get_columns(table.name)}
+            for col in table.columns:
+                if col.name in existentes:
+                    continue
+                if not col.nullable:
+                    print(
+                        f"[DB] Coluna {table.name}.{col.name} não anulável precisa de migração manual", flush=True)
+                    continue
+                tipo = col.type.compile(dialect=engine.dialect)
+                conn.execute(
+                    text(f"ALTER TABLE {table.name} ADD COLUMN {col.name} {tipo}"))
+                print(f"[DB] Coluna adicionada: {table.name}.{col.name}", flush=True)
+
+            indices = {i["name"] for i in insp.get_indexes(table.name)}
+            for idx in table.indexes:
+                if idx.name not in indices:
+                    idx.create(conn)
+                    print(f"[DB] Índice criado: {idx.name}", flush=True)
+
+
+if __name__ == "__main__":
+    # Passo explícito de deploy/migração: python -m app.core.database.
+    # Via o módulo importado (não __main__), que é o Base onde os modelos se registram
+    from app.core import database
+
+    database.init_db()
+    print("[DB] Schema atualizado", flush=True)
@@ -0,0 +1,78 @@
+"""
+Métricas Prometheus do serviço de ingestão (expostas em GET /metrics).
+
+Os workers do pool podem ser processos separados: as métricas são registradas
+no processo principal, as de arquivo a partir do resumo que cada worker devolve
+e as de linhas a cada bloco confirmado (pela fila de progresso).
+"""
+from prometheus_client import Counter, Gauge, Histogram
+
+# Buckets para etapas que vão de milissegundos (bloco pequeno) a minutos (arquivo grande)
+_BUCKETS_ETAPA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+ARQUIVOS_DETECTADOS = Counter(
+    "ingest_arquivos_detectados_total",
+    "Arquivos recebidos para ingestão", ["origem"])
+ARQUIVOS_PROCESSADOS = Counter(
+    "ingest_arquivos_processados_total",
+    "Arquivos processados, por resultado", ["status"])
+LINHAS = Counter(
+    "ingest_linhas_total",
+    "Linhas lidas dos arquivos, aceitas ou rejeitadas", ["resultado"])
+COMPRAS_DUPLICADAS = Counter(
+    "ingest_compras_duplicadas_total",
+    "Compras descartadas antes da publicação por já terem sido publicadas", ["origem"])
+ARQUIVO_DURACAO = Histogram(
+    "ingest_arquivo_duracao_segundos",
+    "Duração total do processamento de um arquivo", buckets=_BUCKETS_ETAPA)
+ETAPA_DURACAO = Histogram(
+    "ingest_etapa_duracao_segundos",
+    "Duração por etapa (leitura, normalizacao e gravacao por arquivo; publicacao por drenagem da outbox)",
+    ["etapa"], buckets=_BUCKETS_ETAPA)
+
+PUBLICACAO_LATENCIA = Histogram(
+    "ingest_publicacao_latencia_segundos",
+    "Envio de um grupo de mensagens ao broker até a confirmação (publisher confirms)",
+    buckets=_BUCKETS_ETAPA)
+PUBLICACAO_MENSAGENS = Counter(
+    "ingest_publicacao_mensagens_total",
+    "Mensagens de lote publicadas, por resultado", ["resultado"])
+
+BACKLOG_WATCHER = Gauge(
+    "ingest_watcher_backlog_arquivos",
+    "Arquivos detectados aguardando estabilidade ou em processamento no watcher")
+BACKLOG_POOL = Gauge(
+    "ingest_pool_backlog_arquivos",
+    "Arquivos pendentes ou em processamento no pool de ingestão")
+FILA_PROFUNDIDADE = Gauge(
+    "ingest_fila_processed_data_mensagens",
+    "Última leitura da profundidade da fila do consumidor (backpressure)")
+BACKPRESSURE_PAUSAS = Counter(
+    "ingest_backpressure_pausas_total",
+    "Vezes em que o relay da outbox pausou por fila acima do high water")
+
+RETENCAO_REMOVIDAS = Counter(
+    "ingest_retencao_removidas_total",
+    "Linhas removidas pela retenção, por tabela", ["tabela"])
+RETENCAO_DURACAO = Histogram(
+    "ingest_retencao_duracao_segundos",
+    "Duração de uma execução do job de retenção", buckets=_BUCKETS_ETAPA)
+RETENCAO_ULTIMA_EXECUCAO = Gauge(
+    "ingest_retencao_ultima_execucao_timestamp",
+    "Momento (unix) da última execução concluída do job de retenção")
+
+
+def registrar_bloco(aceitas: int, rejeitadas: int, duplicadas: int):
+    """Linhas de um bloco já commitado: contam mesmo que o arquivo falhe depois"""
+    LINHAS.labels("aceita").inc(aceitas)
+    LINHAS.labels("rejeitada").inc(rejeitadas)
+    COMPRAS_DUPLICADAS.labels("arquivo").inc(duplicadas)
+
+
+def registrar_resumo(resumo: dict):
+    """Registra as métricas de um arquivo a partir do resumo de process_excel"""
+    ARQUIVOS_PROCESSADOS.labels(resumo.get("status", "erro")).inc()
+    if "duracao" in resumo:
+        ARQUIVO_DURACAO.observe(resumo["duracao"])
+    for etapa, segundos in resumo.get("etapas", {}).items():
+        ETAPA_DURACAO.labels(etapa).observe(segundos)
@@ -1,23 +1,40 @@
+import os
 import threading
 from contextlib import asynccontextmanager
 from datetime import datetime
 from typing import List
-from zoneinfo import ZoneInfo
 
-from app.api.schemas import (ClienteResponse, CompraCreate, CompraResponse,
-                             ProdutoResponse)
+from app.api.exports import gerar_csv, gerar_ndjson
+from app.api.pagination import Paginacao
+from app.api.schemas import (ClienteResponse, CompraCreate,
+                             CompraLoteResponse, CompraResponse,
+                             ProdutoResponse, UploadResponse, UploadStatus)
+from app.api.uploads import (UploadInvalido, extensao_upload, gravar_upload,
+                             publicar_upload, status_upload)
 from app.core.config import settings
-from app.core.database import Base, SessionLocal, engine
+from app.core.database import get_async_db, init_db
+from app.core.metrics import ARQUIVOS_DETECTADOS, COMPRAS_DUPLICADAS
 from app.core.security import create_access_token, verify_token
-from app.models.temp_models import ClienteTemp, CompraTemp, ProdutoTemp
-from app.tasks.publisher import publish_processed_data
-from app.workers.file_watcher import start_file_watcher
-from fastapi import Depends, FastAPI, Form, HTTPException
+from app.models.temp_models import (ClienteTemp, CompraTemp, LoteIngestao,
+                                    ProdutoTemp)
+from app.services.cache import estatisticas_cache
+from app.services.compras import (CompraDuplicada, registrar_compra_api,
+                                  registrar_compras_lote)
+from app.tasks.publisher import estatisticas_publicacao
+from app.workers.backpressure import controle_vazao
+from app.workers.coordenacao import estado_coordenacao, iniciar_coordenacao
+from app.workers.outbox_relay import iniciar_relay
+from app.workers.pool import iniciar_pool, pool_atual
+from app.workers.retencao import iniciar_retencao
+from fastapi import (BackgroundTasks, Body, Depends, FastAPI, File, Form,
+                     HTTPException, Query, Response, UploadFile)
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, StreamingResponse
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
-
-# Cria as tabelas no primeiro start
-Base.metadata.create_all(bind=engine)
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
 
 watcher_thread = None
 
@@ -27,7 +44,21 @@ async def lifespan(app: FastAPI):
     global watcher_thread
     print("[INIT] Entrou no lifespan do FastAPI", flush=True)
 
-    if watcher_thread is None or not watcher_thread.is_alive():
+    # Schema no start é opcional: em produção roda uma vez antes do deploy
+    # (python -m app.core.database) e as réplicas da API só servem requisições
+    if settings.db_init_on_startup:
+        init_db()
+
+    # Leases dos uploads e recuperação dos que ficaram sem dono (inclusive
+    # nas réplicas sem watcher, que também recebem uploads)
+    iniciar_coordenacao()
+
+    if not settings.watcher_enabled:
+        print("[WATCHER] desativado nesta instância (watcher_enabled=false)", flush=True)
+    elif watcher_thread is None or not watcher_thread.is_alive():
+        # Import tardio: pandas/openpyxl só carregam no processo que observa a pasta
+        from app.workers.file_watcher import start_file_watcher
+
         watcher_thread = threading.Thread(
             target=start_file_watcher, daemon=True)
         watcher_thread.start()
@@ -35,6 +66,9 @@ async def lifespan(app: FastAPI):
     else:
         print("[WATCHER] já estava ativo, não duplicado.", flush=True)
 
+    iniciar_relay()
+    iniciar_retencao()
+
     yield
     print("[SHUTDOWN] Encerrando recursos...", flush=True)
 
@@ -44,7 +78,7 @@ def create_app():
         title="Serviço de Ingestão de Dados",
         version="1.0.0",
         description=(
-            "Este microserviço é responsável por ingerir e validar dados enviados via arquivos Excel (.xlsx) "
+            "Este microserviço é responsável por ingerir e validar dados enviados via arquivos Excel (.xlsx), CSV (.csv/.csv.gz), Parquet "
             "ou requisições JSON. Após a validação, os dados são enviados de forma assíncrona para uma fila "
             "RabbitMQ, onde são processados por workers Celery para persistência e tratamento. "
             "Ideal para ingestão massiva e desacoplada de dados em tempo real."
@@ -66,15 +100,6 @@ class TokenResponse(BaseModel):
     token_type: str
 
 
-# Dependência de sessão DB
-
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 # Endpoint
 
 
@@ -86,91 +111,166 @@ async def login(username: str = Form(...), password: str = Form(...)):
     raise HTTPException(status_code=401, detail="Credencias inválidas")
 
 
+@app.get("/metrics", summary="Métricas no formato Prometheus", include_in_schema=False)
+async def metrics():
+    # Sem JWT: lido pelo scraper do Prometheus dentro da rede interna
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
 @app.get("/status", summary="Status do microserviço (JWT protegido)")
 async def status(user=Depends(verify_token)):
-    return {"service": "ingestao", "status": "ok", "user": user["sub"]}
+    pool = pool_atual()
+    return {
+        "service": "ingestao",
+        "status": "ok",
+        "user": user["sub"],
+        "ingestao": pool.snapshot() if pool else None,
+        "publicacao": estatisticas_publicacao(),
+        "cache": estatisticas_cache(),
+        "backpressure": controle_vazao().snapshot(),
+        "coordenacao": estado_coordenacao(),
+    }
 
 
 @app.get("/clientes", response_model=List[ClienteResponse], summary="Listar clientes normalizados")
-def listar_clientes(user=Depends(verify_token), db: Session = Depends(get_db)):
-    return db.query(ClienteTemp).all()
+async def listar_clientes(response: Response, pagina: Paginacao = Depends(), user=Depends(verify_token),
+                          db: AsyncSession = Depends(get_async_db)):
+    stmt = pagina.aplicar(select(ClienteTemp), ClienteTemp.id)
+    return pagina.responder(response, (await db.scalars(stmt)).all())
 
 
 @app.get("/produtos", response_model=List[ProdutoResponse], summary="Listar produtos normalizados")
-def listar_produtos(user=Depends(verify_token), db: Session = Depends(get_db)):
-    return db.query(ProdutoTemp).all()
+async def listar_produtos(response: Response, pagina: Paginacao = Depends(), user=Depends(verify_token),
+                          db: AsyncSession = Depends(get_async_db)):
+    stmt = pagina.aplicar(select(ProdutoTemp), ProdutoTemp.id)
+    return pagina.responder(response, (await db.scalars(stmt)).all())
 
 
 @app.get("/compras", response_model=List[CompraResponse], summary="Listar compras com clientes e produto")
-def listar_compras(user=Depends(verify_token), db: Session = Depends(get_db)):
-    compras = db.query(CompraTemp).all()
-    return compras
+async def listar_compras(
+    response: Response,
+    pagina: Paginacao = Depends(),
+    data_hora_inicio: datetime | None = Query(None, description="data_hora >= (ISO-8601)"),
+    data_hora_fim: datetime | None = Query(None, description="data_hora < (ISO-8601)"),
+    user=Depends(verify_token),
+    db: AsyncSession = Depends(get_async_db),
+):
+    # Cliente e produto no mesmo SELECT (JOIN): página = 1 consulta, sem N+1
+    stmt = select(CompraTemp).options(
+        joinedload(CompraTemp.cliente), joinedload(CompraTemp.produto))
+    if data_hora_inicio is not None:
+        stmt = stmt.where(CompraTemp.data_hora >= data_hora_inicio)
+    if data_hora_fim is not None:
+        stmt = stmt.where(CompraTemp.data_hora < data_hora_fim)
+
+    compras = await db.scalars(pagina.aplicar(stmt, CompraTemp.id))
+    return pagina.responder(response, compras.all())
+
+
+@app.get("/compras/export.ndjson", summary="Exportar compras em NDJSON (streaming)")
+async def exportar_compras_ndjson(
+    data_hora_inicio: datetime | None = Query(None, description="data_hora >= (ISO-8601)"),
+    data_hora_fim: datetime | None = Query(None, description="data_hora < (ISO-8601)"),
+    user=Depends(verify_token),
+):
+    return StreamingResponse(
+        gerar_ndjson(data_hora_inicio, data_hora_fim), media_type="application/x-ndjson")
+
+
+@app.get("/compras/export.csv", summary="Exportar compras em CSV (streaming)")
+async def exportar_compras_csv(
+    data_hora_inicio: datetime | None = Query(None, description="data_hora >= (ISO-8601)"),
+    data_hora_fim: datetime | None = Query(None, description="data_hora < (ISO-8601)"),
+    user=Depends(verify_token),
+):
+    return StreamingResponse(
+        gerar_csv(data_hora_inicio, data_hora_fim), media_type="text/csv",
+        headers={"Content-Disposition": 'attachment; filename="compras.csv"'})
 
 
 @app.post("/compras", response_model=CompraCreate, summary="Criar uma venda via API")
-def criar_compra(compra_data: CompraCreate, user=Depends(verify_token), db: Session = Depends(get_db)):
-
-    data_hora = datetime.now(ZoneInfo("America/Sao_Paulo"))
-
-    cliente = None
-    if compra_data.cliente.cpf_cnpj:
-        cliente = db.query(ClienteTemp).filter_by(
-            cpf_cnpj=compra_data.cliente.cpf_cnpj).first()
-    if not cliente:
-        cliente = db.query(ClienteTemp).filter_by(
-            nome=compra_data.cliente.nome).first()
-    if not cliente:
-        cliente = ClienteTemp(**compra_data.cliente.dict())
-        db.add(cliente)
-        db.commit()
-        db.refresh(cliente)
-
-    produto = db.query(ProdutoTemp).filter_by(
-        nome_produto=compra_data.produto.nome_produto).first()
-    if not produto:
-        produto = ProdutoTemp(nome_produto=compra_data.produto.nome_produto)
-        db.add(produto)
-        db.commit()
-        db.refresh(produto)
-
-    # Cria compra TEMP
-    valor_total = compra_data.quantidade * compra_data.valor_unitario
-    compra = CompraTemp(
-        cliente_id=cliente.id,
-        produto_id=produto.id,
-        quantidade=compra_data.quantidade,
-        valor_unitario=compra_data.valor_unitario,
-        valor_total=valor_total,
-        data_hora=data_hora,
-        forma_pagamento=compra_data.forma_pagamento
-    )
-    db.add(compra)
-    db.commit()
-    db.refresh(compra)
-
-    payload = {
-        "id": compra.id,
-        "cliente": {
-            "id": cliente.id,
-            "nome": cliente.nome,
-            "email": cliente.email,
-            "telefone": cliente.telefone,
-            "cpf_cnpj": cliente.cpf_cnpj,
-            "endereco_completo": cliente.endereco_completo,
-        },
-        "produto": {
-            "id": produto.id,
-            "nome_produto": produto.nome_produto,
-        },
-        "quantidade": int(compra.quantidade),
-        "valor_unitario": float(compra.valor_unitario),
-        "valor_total": float(compra.valor_total),
-        "data_hora": compra.data_hora.isoformat(),
-        "forma_pagamento": compra.forma_pagamento,
-    }
-
-    task_id = publish_processed_data(payload)
+async def criar_compra(compra_data: CompraCreate, user=Depends(verify_token), db: AsyncSession = Depends(get_async_db)):
+    # Reaproveita a lógica síncrona dentro da sessão assíncrona (greenlet)
+    try:
+        compra = await db.run_sync(registrar_compra_api, compra_data)
+    except CompraDuplicada as e:
+        await db.rollback()
+        COMPRAS_DUPLICADAS.labels("api").inc()
+        raise HTTPException(status_code=409, detail=str(e))
+    await db.commit()
     print(
-        f"[API] Publicado no RabbitMQ (processed_data). task_id={task_id}", flush=True)
+        f"[API] Compra {compra.id} gravada; publicação via outbox", flush=True)
 
     return compra
+
+
+@app.post("/compras/batch", response_model=CompraLoteResponse, summary="Criar vendas em lote via API")
+async def criar_compras_lote(
+    itens: list[dict] = Body(..., description="Lista de CompraCreate"),
+    user=Depends(verify_token),
+    db: AsyncSession = Depends(get_async_db),
+):
+    if len(itens) > settings.batch_max_itens:
+        raise HTTPException(
+            status_code=413, detail=f"Máximo de {settings.batch_max_itens} itens por lote")
+
+    # Itens inválidos voltam no resultado (sem 422 para o lote inteiro)
+    resultados = await db.run_sync(registrar_compras_lote, itens)
+    await db.commit()
+
+    criadas = sum(1 for r in resultados if r["status"] == "criada")
+    duplicadas = sum(1 for r in resultados if r["status"] == "duplicada")
+    if duplicadas:
+        COMPRAS_DUPLICADAS.labels("api").inc(duplicadas)
+    print(
+        f"[API] Lote com {criadas}/{len(itens)} compras gravado ({duplicadas} duplicadas); "
+        "publicação via outbox", flush=True)
+    return {"recebidas": len(itens), "criadas": criadas, "duplicadas": duplicadas,
+            "rejeitadas": len(itens) - criadas - duplicadas, "resultados": resultados}
+
+
+@app.post("/uploads", response_model=UploadResponse, status_code=202,
+          summary="Enviar planilha para ingestão em background")
+async def enviar_upload(
+    background_tasks: BackgroundTasks,
+    arquivo: UploadFile = File(...),
+    user=Depends(verify_token),
+    db: AsyncSession = Depends(get_async_db),
+):
+    try:
+        ext = extensao_upload(arquivo.filename)
+        # Cópia em blocos fora do event loop (escrita em disco bloqueante)
+        parcial = await run_in_threadpool(gravar_upload, arquivo.file, ext)
+    except UploadInvalido as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        await arquivo.close()
+
+    lote = LoteIngestao(arquivo=arquivo.filename, origem="upload", status="pendente")
+    db.add(lote)
+    await db.commit()
+
+    path = publicar_upload(parcial, lote.id, ext)
+    # Mesmo pool (e mesmo process_excel) dos arquivos da pasta monitorada
+    background_tasks.add_task(iniciar_pool().submeter, path, lote_id=lote.id)
+    ARQUIVOS_DETECTADOS.labels("upload").inc()
+    print(
+        f"[UPLOAD] {arquivo.filename} recebido como lote {lote.id}", flush=True)
+    return {"id": lote.id, "status": lote.status, "arquivo": arquivo.filename}
+
+
+@app.get("/uploads/{lote_id}", response_model=UploadStatus, summary="Acompanhar ingestão de um upload")
+async def consultar_upload(lote_id: str, user=Depends(verify_token), db: AsyncSession = Depends(get_async_db)):
+    lote = await db.get(LoteIngestao, lote_id)
+    if lote is None:
+        raise HTTPException(status_code=404, detail="Upload não encontrado")
+    return status_upload(lote, pool_atual())
+
+
+@app.get("/uploads/{lote_id}/quarentena", summary="Baixar as linhas rejeitadas de um upload (CSV)")
+async def baixar_quarentena(lote_id: str, user=Depends(verify_token), db: AsyncSession = Depends(get_async_db)):
+    lote = await db.get(LoteIngestao, lote_id)
+    if lote is None or not lote.arquivo_quarentena:
+        raise HTTPException(status_code=404, detail="Upload sem linhas em quarentena")
+    return FileResponse(lote.arquivo_quarentena, media_type="text/csv",
+                        filename=os.path.basename(lote.arquivo_quarentena))
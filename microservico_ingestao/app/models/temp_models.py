@@ -1,13 +1,22 @@
+import uuid
+from datetime import datetime
+
 from app.core.database import Base
-from sqlalchemy import Column, DateTime, Float, ForeignKey, Integer, String
+from sqlalchemy import (JSON, Column, DateTime, Float, ForeignKey, Index,
+                        Integer, String)
 from sqlalchemy.orm import relationship
 
 
+def _novo_lote_id():
+    return uuid.uuid4().hex
+
+
 class ClienteTemp(Base):
     __tablename__ = "clientes_temp"
 
     id = Column(Integer, primary_key=True, index=True)
-    nome = Column(String(255), nullable=False)
+    # Índice: fallback por nome na resolução do cliente (sem cpf_cnpj)
+    nome = Column(String(255), nullable=False, index=True)
     email = Column(String(255), nullable=True)
     telefone = Column(String(50), nullable=True)
     cpf_cnpj = Column(String(20), unique=True, index=True, nullable=True)
@@ -38,8 +47,87 @@ class CompraTemp(Base):
     quantidade = Column(Integer, nullable=False)
     valor_unitario = Column(Float, nullable=False)
     valor_total = Column(Float, nullable=False)
-    data_hora = Column(DateTime, nullable=False)
+    data_hora = Column(DateTime, index=True, nullable=False)
     forma_pagamento = Column(String(50), nullable=False)
 
+    # Lote de ingestão que criou a compra (None para compras via API)
+    lote_id = Column(String(32), ForeignKey(
+        "lotes_ingestao.id", ondelete="SET NULL"), index=True, nullable=True)
+    # Preenchido quando a compra é publicada na fila processed_data
+    # (indexado para a retenção)
+    publicado_em = Column(DateTime, index=True, nullable=True)
+
     cliente = relationship("ClienteTemp", back_populates="compras")
     produto = relationship("ProdutoTemp", back_populates="compras")
+    lote = relationship("LoteIngestao", back_populates="compras")
+
+
+class LoteIngestao(Base):
+    __tablename__ = "lotes_ingestao"
+
+    id = Column(String(32), primary_key=True, default=_novo_lote_id)
+    arquivo = Column(String(255), nullable=True)
+    status = Column(String(20), nullable=False, default="processando")
+    total_compras = Column(Integer, nullable=False, default=0)
+    criado_em = Column(DateTime, nullable=False, default=datetime.now)
+    finalizado_em = Column(DateTime, nullable=True)
+    # "watcher" (pasta monitorada) ou "upload" (POST /uploads)
+    origem = Column(String(20), nullable=True, default="watcher")
+    linhas_processadas = Column(Integer, nullable=True)
+    linhas_rejeitadas = Column(Integer, nullable=True)
+    # Compras descartadas por já terem sido publicadas (dedup)
+    compras_duplicadas = Column(Integer, nullable=True)
+    iniciado_em = Column(DateTime, nullable=True)
+    erro = Column(String(500), nullable=True)
+    # Checkpoint: cada bloco é commitado junto com linhas_processadas (última
+    # linha confirmada); o mesmo conteúdo (SHA-256) retoma o lote inacabado.
+    # checkpoint_em também marca o início de cada execução: lote "processando"
+    # com checkpoint_em recente (< lease_ttl) está com outro job
+    arquivo_hash = Column(String(64), nullable=True, index=True)
+    checkpoint_em = Column(DateTime, nullable=True)
+    # Execuções do arquivo (retomadas incluídas) e CSV das linhas rejeitadas
+    tentativas = Column(Integer, nullable=True)
+    arquivo_quarentena = Column(String(500), nullable=True)
+    # data_hora das linhas sem data_hora própria (+1 µs por compra): herdada
+    # do primeiro lote com o mesmo conteúdo, para o arquivo reenviado gerar as
+    # mesmas chaves de dedup
+    data_hora_base = Column(DateTime, nullable=True)
+
+    compras = relationship("CompraTemp", back_populates="lote")
+
+
+class OutboxMensagem(Base):
+    """
+    Outbox transacional: o payload é gravado na mesma transação da compra e
+    publicado depois pelo relay (app.workers.outbox_relay).
+    """
+    __tablename__ = "outbox_mensagens"
+
+    id = Column(Integer, primary_key=True)
+    compra_id = Column(Integer, ForeignKey(
+        "compras_temp.id", ondelete="CASCADE"), index=True, nullable=True)
+    payload = Column(JSON, nullable=False)
+    criado_em = Column(DateTime, nullable=False, default=datetime.now)
+    proxima_tentativa_em = Column(DateTime, nullable=False, default=datetime.now)
+    tentativas = Column(Integer, nullable=False, default=0)
+    ultimo_erro = Column(String(500), nullable=True)
+    enviado_em = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        # Índice parcial: só as pendentes, que é o que o relay consulta
+        Index("ix_outbox_pendentes", "proxima_tentativa_em", "id",
+              postgresql_where=enviado_em.is_(None),
+              sqlite_where=enviado_em.is_(None)),
+    )
+
+
+class ImpressaoPublicada(Base):
+    """
+    Chaves de idempotência (as mesmas do id_mensagem do consumidor) das compras
+    já enfileiradas para publicação: compras repetidas param na ingestão.
+    Podadas pela retenção depois de dedup_janela_dias.
+    """
+    __tablename__ = "impressoes_publicadas"
+
+    chave = Column(String(64), primary_key=True)
+    criado_em = Column(DateTime, nullable=False, default=datetime.now, index=True)
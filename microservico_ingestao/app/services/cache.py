@@ -0,0 +1,86 @@
+import threading
+from collections import OrderedDict
+from typing import Hashable, Iterable
+
+from app.core.config import settings
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+
+class CacheLRU:
+    """
+    Mapa chave natural -> id de staging, limitado a `tamanho` entradas (LRU).
+    Só guarda acertos: ausência no cache sempre cai na consulta ao banco.
+    Local ao processo (cada worker do pool tem o seu).
+    """
+
+    def __init__(self, nome: str, tamanho: int):
+        self.nome = nome
+        self.tamanho = tamanho
+        self.acertos = 0
+        self.faltas = 0
+        self._dados: OrderedDict[Hashable, int] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def buscar(self, chaves: Iterable[Hashable]) -> dict[Hashable, int]:
+        encontrados = {}
+        with self._lock:
+            for chave in chaves:
+                valor = self._dados.get(chave)
+                if valor is None:
+                    self.faltas += 1
+                else:
+                    self._dados.move_to_end(chave)
+                    encontrados[chave] = valor
+                    self.acertos += 1
+        return encontrados
+
+    def guardar(self, itens: dict[Hashable, int]):
+        if self.tamanho <= 0:
+            return
+        with self._lock:
+            for chave, valor in itens.items():
+                self._dados[chave] = valor
+                self._dados.move_to_end(chave)
+            while len(self._dados) > self.tamanho:
+                self._dados.popitem(last=False)
+
+    def limpar(self):
+        with self._lock:
+            self._dados.clear()
+
+    def estatisticas(self) -> dict:
+        with self._lock:
+            return {"entradas": len(self._dados), "acertos": self.acertos,
+                    "faltas": self.faltas}
+
+
+clientes_por_cpf = CacheLRU("clientes_por_cpf", settings.lookup_cache_size)
+clientes_por_nome = CacheLRU("clientes_por_nome", settings.lookup_cache_size)
+produtos_por_nome = CacheLRU("produtos_por_nome", settings.lookup_cache_size)
+
+CACHES = (clientes_por_cpf, clientes_por_nome, produtos_por_nome)
+
+
+def agendar(db: Session, cache: CacheLRU, itens: dict[Hashable, int]):
+    """
+    Guarda os ids só depois do commit da sessão: ids de linhas criadas numa
+    transação que sofre rollback nunca chegam ao cache.
+    """
+    if itens and cache.tamanho > 0:
+        db.info.setdefault("cache_pendente", []).append((cache, dict(itens)))
+
+
+@event.listens_for(Session, "after_commit")
+def _aplicar_pendentes(session: Session):
+    for cache, itens in session.info.pop("cache_pendente", ()):
+        cache.guardar(itens)
+
+
+@event.listens_for(Session, "after_rollback")
+def _descartar_pendentes(session: Session):
+    session.info.pop("cache_pendente", None)
+
+
+def estatisticas_cache() -> dict:
+    return {c.nome: c.estatisticas() for c in CACHES}
@@ -0,0 +1,102 @@
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+from app.api.schemas import CompraCreate
+from app.models.temp_models import CompraTemp
+from app.services.outbox import enfileirar_compras
+from app.services.staging import (registrar_vendas, resolver_clientes,
+                                  resolver_produtos)
+from pydantic import ValidationError
+from sqlalchemy.orm import Session
+
+
+class CompraDuplicada(ValueError):
+    pass
+
+
+def registrar_compra_api(db: Session, compra_data: CompraCreate) -> CompraTemp:
+    """
+    Resolve cliente/produto, cria a compra e grava o payload na outbox.
+    Não faz commit: quem chama fecha a transação (síncrona ou via run_sync).
+    Compra já publicada antes (mesma chave do consumidor) -> CompraDuplicada.
+    """
+    data_hora = compra_data.data_hora or datetime.now(ZoneInfo("America/Sao_Paulo"))
+
+    # Mesma resolução (e cache) da ingestão de arquivos: cpf_cnpj, nome, cria
+    cliente_id, = resolver_clientes(db, [compra_data.cliente.model_dump()])
+    nome_produto = compra_data.produto.nome_produto
+    produto_id = resolver_produtos(db, [nome_produto])[nome_produto]
+
+    # Cria compra TEMP
+    valor_total = compra_data.quantidade * compra_data.valor_unitario
+    compra = CompraTemp(
+        cliente_id=cliente_id,
+        produto_id=produto_id,
+        quantidade=compra_data.quantidade,
+        valor_unitario=compra_data.valor_unitario,
+        valor_total=valor_total,
+        data_hora=data_hora,
+        forma_pagamento=compra_data.forma_pagamento
+    )
+    db.add(compra)
+    db.flush()
+
+    # Outbox na mesma transação: a requisição não espera pelo RabbitMQ
+    _, duplicadas = enfileirar_compras(db, [compra.id])
+    if duplicadas:
+        raise CompraDuplicada("Compra já publicada (mesma chave de idempotência)")
+    return compra
+
+
+def _erro_validacao(e: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in e.errors())
+
+
+def registrar_compras_lote(db: Session, itens: list) -> list[dict]:
+    """
+    Valida os itens numa passada (schema + regras da ingestão de arquivos),
+    resolve clientes/produtos em lote e insere as compras válidas num único
+    INSERT, com a outbox na mesma transação. Retorna um resultado por item,
+    na ordem recebida. Não faz commit.
+    """
+    # pandas só quando o endpoint de lote é usado (não pesa no start da API)
+    import pandas as pd
+    from app.workers.normalizer import normalizar_vendas, para_registros
+
+    resultados: list[dict] = [{"indice": i} for i in range(len(itens))]
+
+    linhas, indices = [], []
+    for i, item in enumerate(itens):
+        try:
+            compra = CompraCreate.model_validate(item)
+        except ValidationError as e:
+            resultados[i].update(status="rejeitada", erro=_erro_validacao(e))
+            continue
+        linhas.append({**compra.cliente.model_dump(),
+                       "produto": compra.produto.nome_produto,
+                       "quantidade": compra.quantidade,
+                       "valor_unitario": compra.valor_unitario,
+                       "forma_pagamento": compra.forma_pagamento,
+                       "data_hora": compra.data_hora})
+        indices.append(i)
+
+    if linhas:
+        # Mesmas regras (e motivos) da planilha; "linha" = índice do item
+        validas, rejeitadas = normalizar_vendas(pd.DataFrame(linhas, index=indices))
+        for i, motivo in zip(rejeitadas["linha"], rejeitadas["motivo"]):
+            resultados[i].update(status="rejeitada", erro=motivo)
+
+        registros = para_registros(validas)
+        compra_ids = registrar_vendas(
+            db, registros, datetime.now(ZoneInfo("America/Sao_Paulo")))
+        _, duplicadas = enfileirar_compras(db, compra_ids)
+        duplicadas = set(duplicadas)
+        for r, compra_id in zip(registros, compra_ids):
+            if compra_id in duplicadas:
+                resultados[r["linha"]].update(
+                    status="duplicada", erro="compra já publicada")
+            else:
+                resultados[r["linha"]].update(status="criada", id=compra_id)
+
+    return resultados
@@ -0,0 +1,39 @@
+import hashlib
+import re
+from datetime import datetime
+from decimal import Decimal
+from zoneinfo import ZoneInfo
+
+from app.core.config import settings
+
+_DIGITOS = re.compile(r"\D+")
+
+
+def impressao_compra(payload: dict) -> str:
+    """
+    Mesma "impressão digital" do consumidor (Django: workers.parsers.parse_payload
+    + workers.idempotency.make_purchase_fprint), calculada sobre o payload
+    publicado. Qualquer mudança lá precisa ser espelhada aqui.
+    """
+    cliente = payload["cliente"]
+    data_hora = datetime.fromisoformat(str(payload["data_hora"]).replace("Z", "+00:00"))
+    if data_hora.tzinfo is None:
+        # O Django torna aware no TIME_ZONE dele
+        data_hora = data_hora.replace(tzinfo=ZoneInfo(settings.consumidor_timezone))
+
+    partes = [
+        _DIGITOS.sub("", cliente.get("cpf_cnpj") or ""),
+        (cliente.get("email") or "").strip().lower(),
+        (payload["produto"].get("nome_produto") or "").strip(),
+        str(int(payload["quantidade"])),
+        str(Decimal(str(payload["valor_unitario"]))),
+        str(Decimal(str(payload["valor_total"]))),
+        data_hora.isoformat(),
+        ((payload.get("forma_pagamento") or "").strip() or "OUTROS").upper(),
+    ]
+    return "|".join(partes)
+
+
+def chave_idempotencia(payload: dict) -> str:
+    """SHA-256 da impressão: igual ao id_mensagem gravado pelo consumidor"""
+    return hashlib.sha256(impressao_compra(payload).encode("utf-8")).hexdigest()
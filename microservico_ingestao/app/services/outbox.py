@@ -0,0 +1,118 @@
+from datetime import datetime, timedelta
+
+from app.core.config import settings
+from app.models.temp_models import (CompraTemp, ImpressaoPublicada,
+                                    OutboxMensagem)
+from app.services.idempotencia import chave_idempotencia
+from app.services.payloads import compra_payload
+from app.services.staging import (IN_CHUNK, _chunks,
+                                  _insert_ignorando_conflitos,
+                                  marcar_publicadas)
+from sqlalchemy import delete, insert, select
+from sqlalchemy.orm import Session, joinedload
+
+
+def _separar_duplicadas(db: Session, compras: list[CompraTemp], agora: datetime):
+    """
+    Registra a chave de idempotência de cada compra; as que já existiam (ou se
+    repetem no bloco) são duplicadas. Retorna ([(compra, payload)] novas, [ids duplicados]).
+    """
+    por_chave: dict[str, tuple[CompraTemp, dict]] = {}
+    duplicadas: list[int] = []
+    for c in compras:
+        payload = compra_payload(c)
+        chave = chave_idempotencia(payload)
+        if chave in por_chave:
+            duplicadas.append(c.id)
+        else:
+            por_chave[chave] = (c, payload)
+    if not por_chave:
+        return [], duplicadas
+
+    # ON CONFLICT DO NOTHING: só voltam as chaves inseridas agora (atômico
+    # entre workers/réplicas, pela chave primária)
+    stmt = _insert_ignorando_conflitos(db, ImpressaoPublicada).returning(
+        ImpressaoPublicada.chave)
+    novas = set(db.scalars(
+        stmt, [{"chave": k, "criado_em": agora} for k in por_chave]).all())
+
+    itens = []
+    for chave, (c, payload) in por_chave.items():
+        if chave in novas:
+            itens.append((c, payload))
+        else:
+            duplicadas.append(c.id)
+    return itens, duplicadas
+
+
+def enfileirar_compras(db: Session, compra_ids: list[int]) -> tuple[int, list[int]]:
+    """
+    Grava na outbox o payload de cada compra. Deve rodar na mesma transação
+    que criou as compras: ou ambas são gravadas, ou nenhuma.
+    Com dedup_enabled, compras já publicadas antes (mesma chave do consumidor)
+    saem do staging sem passar pela outbox.
+    Retorna (quantidade enfileirada, ids das compras duplicadas removidas).
+    """
+    agora = datetime.now()
+    total = 0
+    duplicadas: list[int] = []
+    for parte in _chunks(compra_ids, IN_CHUNK):
+        compras = db.scalars(
+            select(CompraTemp)
+            .options(joinedload(CompraTemp.cliente), joinedload(CompraTemp.produto))
+            .where(CompraTemp.id.in_(parte))
+            .order_by(CompraTemp.id)
+        ).all()
+        if settings.dedup_enabled:
+            itens, dup = _separar_duplicadas(db, compras, agora)
+            duplicadas.extend(dup)
+        else:
+            itens = [(c, compra_payload(c)) for c in compras]
+
+        if itens:
+            db.execute(insert(OutboxMensagem), [
+                {"compra_id": c.id, "payload": payload,
+                 "criado_em": agora, "proxima_tentativa_em": agora}
+                for c, payload in itens
+            ])
+        total += len(itens)
+
+    for parte in _chunks(duplicadas, IN_CHUNK):
+        db.execute(
+            delete(CompraTemp).where(CompraTemp.id.in_(parte))
+            .execution_options(synchronize_session=False))
+    return total, duplicadas
+
+
+def reservar_pendentes(db: Session, limite: int) -> list[OutboxMensagem]:
+    """
+    Bloqueia (FOR UPDATE SKIP LOCKED) as próximas mensagens prontas para envio;
+    relays concorrentes pegam blocos diferentes.
+    """
+    return db.scalars(
+        select(OutboxMensagem)
+        .where(OutboxMensagem.enviado_em.is_(None),
+               OutboxMensagem.proxima_tentativa_em <= datetime.now())
+        .order_by(OutboxMensagem.proxima_tentativa_em, OutboxMensagem.id)
+        .limit(limite)
+        .with_for_update(skip_locked=True)
+    ).all()
+
+
+def marcar_enviadas(db: Session, mensagens: list[OutboxMensagem]) -> None:
+    agora = datetime.now()
+    for msg in mensagens:
+        msg.enviado_em = agora
+        msg.ultimo_erro = None
+    marcar_publicadas(
+        db, [m.compra_id for m in mensagens if m.compra_id is not None], agora)
+
+
+def marcar_falha(mensagens: list[OutboxMensagem], erro: Exception) -> None:
+    """Reagenda com backoff exponencial (limitado a outbox_max_backoff)"""
+    agora = datetime.now()
+    for msg in mensagens:
+        msg.tentativas += 1
+        msg.ultimo_erro = str(erro)[:500]
+        espera = min(2 ** msg.tentativas, settings.outbox_max_backoff)
+        msg.proxima_tentativa_em = agora + timedelta(seconds=espera)
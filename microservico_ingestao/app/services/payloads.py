@@ -0,0 +1,31 @@
+from app.models.temp_models import CompraTemp
+
+
+def compra_payload(compra: CompraTemp) -> dict:
+    """
+    Monta o payload normalizado da compra no formato consumido pelo Django
+    (workers.parsers.parse_payload). Requer cliente e produto carregados.
+    """
+    cliente = compra.cliente
+    produto = compra.produto
+    return {
+        "id": compra.id,
+        "cliente": {
+            "id": cliente.id,
+            "nome": cliente.nome,
+            "email": cliente.email,
+            "telefone": cliente.telefone,
+            "cpf_cnpj": cliente.cpf_cnpj,
+            "endereco_completo": cliente.endereco_completo,
+        },
+        "produto": {
+            # o parser do Django já converte nome_produto -> nome
+            "id": produto.id,
+            "nome_produto": produto.nome_produto,
+        },
+        "quantidade": int(compra.quantidade),
+        "valor_unitario": float(compra.valor_unitario),
+        "valor_total": float(compra.valor_total),
+        "data_hora": compra.data_hora.isoformat(),  # o parser no Django torna aware
+        "forma_pagamento": compra.forma_pagamento,
+    }
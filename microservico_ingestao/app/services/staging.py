@@ -0,0 +1,182 @@
+from datetime import datetime, timedelta
+from typing import Iterable
+
+from app.models.temp_models import ClienteTemp, CompraTemp, ProdutoTemp
+from app.services.cache import (CacheLRU, agendar, clientes_por_cpf,
+                                clientes_por_nome, produtos_por_nome)
+from sqlalchemy import insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+# Limite de valores por cláusula IN (...) para não estourar parâmetros do driver
+IN_CHUNK = 1000
+
+CLIENTE_FIELDS = ("nome", "email", "telefone", "cpf_cnpj", "endereco_completo")
+
+
+def _chunks(seq: list, size: int):
+    for i in range(0, len(seq), size):
+        yield seq[i:i + size]
+
+
+def _insert_ignorando_conflitos(db: Session, model):
+    """INSERT ... ON CONFLICT DO NOTHING quando o dialeto suporta"""
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        return postgresql.insert(model).on_conflict_do_nothing()
+    if dialect == "sqlite":
+        return sqlite.insert(model).on_conflict_do_nothing()
+    return insert(model)
+
+
+def _buscar_ids(db: Session, coluna, valores: Iterable[str],
+                cache: CacheLRU | None = None) -> dict[str, int]:
+    """
+    Mapeia valor -> id em poucas consultas IN; em duplicados vence o menor id.
+    Com `cache`, só consulta o banco o que não estiver nele.
+    """
+    valores = list(valores)
+    mapa: dict[str, int] = cache.buscar(valores) if cache else {}
+
+    model = coluna.class_
+    do_banco: dict[str, int] = {}
+    for parte in _chunks([v for v in valores if v not in mapa], IN_CHUNK):
+        rows = db.execute(
+            select(coluna, model.id).where(coluna.in_(parte)).order_by(model.id.desc())
+        ).all()
+        do_banco.update(rows)
+
+    if cache:
+        agendar(db, cache, do_banco)
+    mapa.update(do_banco)
+    return mapa
+
+
+def resolver_produtos(db: Session, nomes: Iterable[str]) -> dict[str, int]:
+    """Resolve nome_produto -> id, criando em lote os produtos que faltam"""
+    nomes = set(nomes)
+    mapa = _buscar_ids(db, ProdutoTemp.nome_produto, nomes, produtos_por_nome)
+
+    novos = [{"nome_produto": n} for n in nomes if n not in mapa]
+    if novos:
+        stmt = _insert_ignorando_conflitos(db, ProdutoTemp).returning(
+            ProdutoTemp.nome_produto, ProdutoTemp.id)
+        criados = dict(db.execute(stmt, novos).all())
+        agendar(db, produtos_por_nome, criados)
+        mapa.update(criados)
+
+        # Outro processo pode ter criado o mesmo produto no intervalo
+        faltando = [n["nome_produto"] for n in novos if n["nome_produto"] not in mapa]
+        if faltando:
+            mapa.update(_buscar_ids(db, ProdutoTemp.nome_produto, faltando, produtos_por_nome))
+    return mapa
+
+
+def resolver_clientes(db: Session, registros: list[dict]) -> list[int]:
+    """
+    Resolve o id do cliente de cada registro com a mesma precedência da
+    ingestão linha a linha: cpf_cnpj, depois nome, senão cria o cliente.
+    """
+    ids: list[int | None] = [None] * len(registros)
+
+    por_cpf = _buscar_ids(
+        db, ClienteTemp.cpf_cnpj, {r["cpf_cnpj"] for r in registros if r["cpf_cnpj"]},
+        clientes_por_cpf)
+    pendentes = []
+    for i, r in enumerate(registros):
+        cliente_id = por_cpf.get(r["cpf_cnpj"]) if r["cpf_cnpj"] else None
+        if cliente_id is None:
+            pendentes.append(i)
+        else:
+            ids[i] = cliente_id
+
+    por_nome = _buscar_ids(
+        db, ClienteTemp.nome, {registros[i]["nome"] for i in pendentes}, clientes_por_nome)
+    novos_idx = []
+    for i in pendentes:
+        cliente_id = por_nome.get(registros[i]["nome"])
+        if cliente_id is None:
+            novos_idx.append(i)
+        else:
+            ids[i] = cliente_id
+
+    if novos_idx:
+        # Um cliente novo por nome (a 2ª linha acharia o 1º pelo nome) e sem
+        # repetir cpf_cnpj, que é único na tabela
+        novos, nomes_vistos, cpfs_vistos = [], set(), set()
+        for i in novos_idx:
+            r = registros[i]
+            if r["nome"] in nomes_vistos or (r["cpf_cnpj"] and r["cpf_cnpj"] in cpfs_vistos):
+                continue
+            nomes_vistos.add(r["nome"])
+            if r["cpf_cnpj"]:
+                cpfs_vistos.add(r["cpf_cnpj"])
+            novos.append({f: r[f] for f in CLIENTE_FIELDS})
+
+        stmt = _insert_ignorando_conflitos(db, ClienteTemp).returning(
+            ClienteTemp.id, ClienteTemp.nome, ClienteTemp.cpf_cnpj)
+        criados = db.execute(stmt, novos).all()
+        novo_por_cpf = {c.cpf_cnpj: c.id for c in criados if c.cpf_cnpj}
+        novo_por_nome = {c.nome: c.id for c in criados}
+        agendar(db, clientes_por_cpf, novo_por_cpf)
+        agendar(db, clientes_por_nome, novo_por_nome)
+
+        # cpf_cnpj inserido por outro processo no intervalo (conflito ignorado)
+        faltando = cpfs_vistos - novo_por_cpf.keys()
+        if faltando:
+            novo_por_cpf.update(
+                _buscar_ids(db, ClienteTemp.cpf_cnpj, faltando, clientes_por_cpf))
+            for r in novos:
+                if r["cpf_cnpj"] in faltando:
+                    novo_por_nome.setdefault(r["nome"], novo_por_cpf[r["cpf_cnpj"]])
+
+        for i in novos_idx:
+            r = registros[i]
+            ids[i] = novo_por_cpf.get(r["cpf_cnpj"]) or novo_por_nome[r["nome"]]
+
+    return ids
+
+
+def registrar_vendas(db: Session, registros: list[dict], data_hora: datetime,
+                     lote_id: str | None = None) -> list[int]:
+    """
+    Grava em lote as vendas já normalizadas (chaves de CLIENTE_FIELDS, "produto",
+    "quantidade", "valor_unitario", "valor_total", "forma_pagamento" e,
+    opcional, "data_hora").
+    Retorna os ids das compras inseridas, na ordem dos registros.
+    """
+    if not registros:
+        return []
+
+    cliente_ids = resolver_clientes(db, registros)
+    produto_ids = resolver_produtos(db, (r["produto"] for r in registros))
+
+    compras = [
+        {
+            "cliente_id": cliente_id,
+            "produto_id": produto_ids[r["produto"]],
+            "quantidade": r["quantidade"],
+            "valor_unitario": r["valor_unitario"],
+            "valor_total": r["valor_total"],
+            # data_hora do arquivo, se houver; senão +1µs por linha: mantém
+            # data_hora distinta entre linhas iguais, já que a idempotência
+            # do consumidor inclui data_hora
+            "data_hora": r.get("data_hora") or data_hora + timedelta(microseconds=i),
+            "forma_pagamento": r["forma_pagamento"],
+            "lote_id": lote_id,
+        }
+        for i, (r, cliente_id) in enumerate(zip(registros, cliente_ids))
+    ]
+    stmt = insert(CompraTemp).returning(CompraTemp.id, sort_by_parameter_order=True)
+    return list(db.scalars(stmt, compras))
+
+
+def marcar_publicadas(db: Session, compra_ids: list[int], quando: datetime) -> None:
+    """Marca as compras como publicadas (em blocos de IN_CHUNK ids)"""
+    for parte in _chunks(compra_ids, IN_CHUNK):
+        db.execute(
+            update(CompraTemp)
+            .where(CompraTemp.id.in_(parte))
+            .values(publicado_em=quando)
+            .execution_options(synchronize_session=False)
+        )
@@ -0,0 +1,46 @@
+import hashlib
+import os
+
+from app.core.config import settings
+
+# Sem pandas/openpyxl: importado também pela API (uploads), que não lê planilhas
+DATA_PATH = settings.data_path
+PROCESSED_PATH = os.path.join(DATA_PATH, "processed")
+# Subpasta fora do alcance do detector (não recursivo): uploads vão direto ao pool
+UPLOADS_PATH = os.path.join(DATA_PATH, "uploads")
+# Arquivos que falharam ingest_max_tentativas vezes (ou inválidos) e as
+# linhas rejeitadas de cada arquivo (CSV com a coluna "motivo")
+FAILED_PATH = os.path.join(DATA_PATH, "failed")
+QUARENTENA_PATH = os.path.join(DATA_PATH, "quarentena")
+# Arquivos já reivindicados por uma réplica (claimed/<replica>/), fora do detector
+CLAIMED_PATH = os.path.join(DATA_PATH, "claimed")
+
+EXTENSOES_SUPORTADAS = (".xlsx", ".csv", ".csv.gz", ".parquet")
+
+os.makedirs(PROCESSED_PATH, exist_ok=True)
+os.makedirs(UPLOADS_PATH, exist_ok=True)
+os.makedirs(CLAIMED_PATH, exist_ok=True)
+os.makedirs(FAILED_PATH, exist_ok=True)
+os.makedirs(QUARENTENA_PATH, exist_ok=True)
+
+
+def extensao_suportada(nome: str) -> str | None:
+    """Extensão reconhecida (inclusive composta, ex.: ".csv.gz") ou None"""
+    nome = nome.lower()
+    return next((ext for ext in EXTENSOES_SUPORTADAS if nome.endswith(ext)), None)
+
+
+def arquivo_suportado(path: str) -> bool:
+    nome = os.path.basename(path)
+    # "~$" são arquivos de lock do Excel; "." ocultos/temporários de cópia
+    return (extensao_suportada(nome) is not None and not nome.startswith(("~$", "."))
+            and os.path.isfile(path))
+
+
+def hash_arquivo(path: str, bloco: int = 1024 * 1024) -> str:
+    """SHA-256 do conteúdo (identifica o arquivo para retomar do checkpoint)"""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        while dados := f.read(bloco):
+            h.update(dados)
+    return h.hexdigest()
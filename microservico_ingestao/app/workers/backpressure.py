@@ -0,0 +1,113 @@
+import threading
+import time
+
+from app.core.config import settings
+from app.core.metrics import BACKPRESSURE_PAUSAS, FILA_PROFUNDIDADE
+from app.tasks.publisher import ROUTING, profundidade_fila
+
+_controle = None
+
+
+class ControleVazao:
+    """
+    Regula o relay da outbox pela profundidade da fila do consumidor.
+    avaliar() devolve a fração da vazão normal liberada: 1 (normal),
+    entre 0 e 1 (reduzida) ou 0 (pausado, com histerese até low_water).
+    """
+
+    FATOR_MINIMO = 0.1
+
+    def __init__(self, fila: str = ROUTING["queue"], ler_profundidade=profundidade_fila):
+        self.fila = fila
+        self._ler = ler_profundidade
+        self._lock = threading.Lock()
+        self.profundidade: int | None = None
+        self.lido_em = 0.0
+        self.erro: str | None = None
+        self.pausado = False
+        self.pausado_desde: float | None = None
+        self.pausas = 0
+        self.tempo_pausado = 0.0
+        self.fator = 1.0
+
+    def _atualizar(self):
+        agora = time.monotonic()
+        if self.lido_em and agora - self.lido_em < settings.backpressure_check_interval:
+            return
+        self.lido_em = agora
+        try:
+            self.profundidade = self._ler(self.fila)
+            self.erro = None
+        except Exception as e:
+            # Broker fora: a publicação falha e reagenda sozinha; não pausa por isso
+            self.profundidade = None
+            self.erro = f"{type(e).__name__}: {e}"
+            return
+        FILA_PROFUNDIDADE.set(self.profundidade)
+
+    def avaliar(self) -> float:
+        if not settings.backpressure_enabled:
+            return 1.0
+        with self._lock:
+            self._atualizar()
+            alta, baixa = settings.backpressure_high_water, settings.backpressure_low_water
+            n = self.profundidade
+            agora = time.monotonic()
+
+            if n is None:
+                fator = 1.0
+            elif self.pausado:
+                fator = 0.0
+                if n <= baixa:
+                    self.pausado = False
+                    self.tempo_pausado += agora - self.pausado_desde
+                    self.pausado_desde = None
+                    print(f"[BACKPRESSURE] Fila {self.fila} com {n} mensagens; relay retomado", flush=True)
+                    fator = 1.0
+            elif n >= alta:
+                self.pausado = True
+                self.pausado_desde = agora
+                self.pausas += 1
+                BACKPRESSURE_PAUSAS.inc()
+                print(
+                    f"[BACKPRESSURE] Fila {self.fila} com {n} mensagens (limite {alta}); relay pausado", flush=True)
+                fator = 0.0
+            elif n > baixa:
+                fator = max(1 - (n - baixa) / max(alta - baixa, 1), self.FATOR_MINIMO)
+            else:
+                fator = 1.0
+
+            self.fator = fator
+            return fator
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            pausado_total = self.tempo_pausado
+            if self.pausado_desde is not None:
+                pausado_total += time.monotonic() - self.pausado_desde
+            if not settings.backpressure_enabled:
+                estado = "desativado"
+            elif self.pausado:
+                estado = "pausado"
+            elif self.fator < 1:
+                estado = "reduzido"
+            else:
+                estado = "normal"
+            return {
+                "fila": self.fila,
+                "estado": estado,
+                "profundidade": self.profundidade,
+                "high_water": settings.backpressure_high_water,
+                "low_water": settings.backpressure_low_water,
+                "vazao_relativa": round(self.fator, 3),
+                "pausas": self.pausas,
+                "tempo_pausado_s": round(pausado_total, 1),
+                "erro": self.erro,
+            }
+
+
+def controle_vazao() -> ControleVazao:
+    global _controle
+    if _controle is None:
+        _controle = ControleVazao()
+    return _controle
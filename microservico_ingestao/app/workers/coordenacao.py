@@ -0,0 +1,258 @@
+import hashlib
+import os
+import re
+import socket
+import threading
+import time
+import uuid
+
+from app.core.config import settings
+from app.core.database import SessionLocal, engine
+from app.models.temp_models import LoteIngestao
+from app.workers.arquivos import (CLAIMED_PATH, DATA_PATH, FAILED_PATH,
+                                  PROCESSED_PATH, UPLOADS_PATH,
+                                  extensao_suportada)
+from app.workers.pool import iniciar_pool, pool_atual
+from sqlalchemy import text
+
+# Identidade desta réplica (processo): nome da pasta em claimed/
+REPLICA_ID = settings.replica_id or f"{socket.gethostname()}-{os.getpid()}"
+
+# Prefixo único dos arquivos em claimed/ (dois arquivos com o mesmo nome não
+# se sobrescrevem)
+_PREFIXO = re.compile(r"^[0-9a-f]{32}_")
+
+_coordenacao_thread = None
+
+
+def pasta_replica() -> str:
+    return os.path.join(CLAIMED_PATH, REPLICA_ID)
+
+
+def reivindicar(path: str) -> str | None:
+    """
+    Move o arquivo para claimed/<replica> (rename atômico no mesmo volume).
+    Só uma réplica consegue: as demais recebem None e ignoram o arquivo.
+    O nome ganha um prefixo único; o original sai de nome_original().
+    """
+    pasta = pasta_replica()
+    os.makedirs(pasta, exist_ok=True)
+    destino = os.path.join(pasta, f"{uuid.uuid4().hex}_{os.path.basename(path)}")
+    try:
+        os.rename(path, destino)
+    except FileNotFoundError:
+        return None  # outra réplica chegou antes
+    os.utime(destino)  # início do lease
+    return destino
+
+
+def nome_original(path: str) -> str:
+    """Nome do arquivo como chegou em DATA_PATH (sem o prefixo de claimed/)"""
+    nome = os.path.basename(path)
+    if os.path.dirname(os.path.dirname(os.path.abspath(path))) == os.path.abspath(CLAIMED_PATH):
+        return _PREFIXO.sub("", nome, count=1)
+    return nome
+
+
+def devolver(path: str):
+    """Solta o arquivo reivindicado que não saiu de claimed/ (processamento falhou)"""
+    destino = os.path.join(DATA_PATH, nome_original(path))
+    if os.path.exists(path) and not os.path.exists(destino):
+        os.rename(path, destino)
+
+
+def renovar_leases():
+    """
+    Atualiza o mtime dos arquivos desta réplica (lease ainda válido): os de
+    claimed/<replica> e os uploads que estão no pool desta réplica
+    """
+    pasta = pasta_replica()
+    arquivos = ([os.path.join(pasta, nome) for nome in os.listdir(pasta)]
+                if os.path.isdir(pasta) else [])
+    pool = pool_atual()
+    if pool is not None:
+        arquivos += [p for p in pool.em_andamento()
+                     if os.path.dirname(p) == UPLOADS_PATH]
+    for path in arquivos:
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            continue  # terminou e foi movido para processed/
+
+
+def recuperar_expirados() -> int:
+    """
+    Devolve para a pasta monitorada os arquivos de réplicas que pararam de
+    renovar o lease (réplica morta no meio do processamento).
+    """
+    limite = time.time() - settings.lease_ttl
+    devolvidos = 0
+    for replica in os.listdir(CLAIMED_PATH):
+        pasta = os.path.join(CLAIMED_PATH, replica)
+        if replica == REPLICA_ID or not os.path.isdir(pasta):
+            continue
+        for nome in os.listdir(pasta):
+            origem = os.path.join(pasta, nome)
+            destino = os.path.join(DATA_PATH, nome_original(origem))
+            try:
+                if os.path.getmtime(origem) > limite or os.path.exists(destino):
+                    continue
+                os.rename(origem, destino)
+            except FileNotFoundError:
+                continue
+            devolvidos += 1
+            print(
+                f"[LEASE] {nome_original(origem)} de {replica} expirou; "
+                f"devolvido para {DATA_PATH}", flush=True)
+        try:
+            os.rmdir(pasta)  # só sai se ficou vazia
+        except OSError:
+            pass
+    return devolvidos
+
+
+def recuperar_uploads() -> int:
+    """
+    Reenvia ao pool os uploads sem dono: arquivo em uploads/ sem renovação há
+    lease_ttl segundos (réplica reiniciada ou morta antes de concluir o lote).
+    O lote retoma do checkpoint; lote já encerrado só tem o arquivo arquivado.
+    """
+    limite = time.time() - settings.lease_ttl
+    reenviados = 0
+    for nome in os.listdir(UPLOADS_PATH):
+        ext = extensao_suportada(nome)
+        path = os.path.join(UPLOADS_PATH, nome)
+        if ext is None:
+            continue  # ".part": upload ainda sendo gravado
+        try:
+            if os.path.getmtime(path) > limite:
+                continue
+        except FileNotFoundError:
+            continue
+        lote_id = nome[:-len(ext)]
+        with SessionLocal() as db:
+            lote = db.get(LoteIngestao, lote_id)
+            status = lote.status if lote is not None else None
+
+        if status in (None, "concluido", "falhou"):
+            pasta = PROCESSED_PATH if status == "concluido" else FAILED_PATH
+            os.replace(path, os.path.join(pasta, nome))
+            print(f"[LEASE] Upload {nome} sem lote ativo movido para {pasta}", flush=True)
+            continue
+        os.utime(path)  # lease desta réplica
+        iniciar_pool().submeter(path, lote_id=lote_id)
+        reenviados += 1
+        print(f"[LEASE] Upload do lote {lote_id} ({status}) sem dono; reenviado ao pool",
+              flush=True)
+    return reenviados
+
+
+class Lideranca:
+    """
+    Liderança de um job singleton entre réplicas: advisory lock de sessão do
+    Postgres, preso numa conexão dedicada enquanto a réplica for líder. Se a
+    conexão cai, o lock é liberado e outra réplica assume. Fora do Postgres
+    (ex.: SQLite local) há uma réplica só e ela é sempre líder.
+    """
+
+    def __init__(self, nome: str):
+        self.nome = nome
+        self.chave = int.from_bytes(
+            hashlib.sha256(nome.encode()).digest()[:8], "big", signed=True)
+        self._conexao = None
+
+    def tentar(self) -> bool:
+        if engine.dialect.name != "postgresql":
+            return True
+        if self._conexao is not None:
+            try:
+                self._conexao.exec_driver_sql("SELECT 1")
+                self._conexao.commit()
+                return True
+            except Exception as e:
+                print(f"[LIDER] {self.nome}: conexão perdida ({e})", flush=True)
+                self._descartar()
+
+        conexao = engine.connect()
+        try:
+            lider = conexao.execute(
+                text("SELECT pg_try_advisory_lock(:chave)"), {"chave": self.chave}).scalar()
+            conexao.commit()
+        except Exception:
+            conexao.close()
+            raise
+        if not lider:
+            conexao.close()
+            return False
+        self._conexao = conexao
+        print(f"[LIDER] {REPLICA_ID} assumiu {self.nome}", flush=True)
+        return True
+
+    def _descartar(self):
+        try:
+            self._conexao.invalidate()
+        except Exception:
+            pass
+        self._conexao = None
+
+    @property
+    def ativa(self) -> bool:
+        return self._conexao is not None or engine.dialect.name != "postgresql"
+
+
+_liderancas: dict[str, Lideranca] = {}
+
+
+def lideranca(nome: str) -> Lideranca:
+    if nome not in _liderancas:
+        _liderancas[nome] = Lideranca(nome)
+    return _liderancas[nome]
+
+
+def estado_coordenacao() -> dict:
+    return {"replica": REPLICA_ID,
+            "lider": sorted(n for n, l in _liderancas.items() if l.ativa)}
+
+
+def _loop_coordenacao():
+    recuperacao = lideranca("ingestao.recuperacao_leases")
+    while True:
+        try:
+            renovar_leases()
+            if recuperacao.tentar():
+                recuperar_expirados()
+                recuperar_uploads()
+        except Exception as e:
+            print(f"[LEASE] Erro na coordenação: {e}", flush=True)
+        time.sleep(max(settings.lease_ttl / 3, 1))
+
+
+def _devolver_proprios():
+    # Mesmo replica_id de uma execução anterior: o que ficou em claimed/ não
+    # está sendo processado por ninguém
+    pasta = pasta_replica()
+    if not os.path.isdir(pasta):
+        return
+    for nome in os.listdir(pasta):
+        origem = os.path.join(pasta, nome)
+        destino = os.path.join(DATA_PATH, nome_original(origem))
+        if not os.path.exists(destino):
+            os.rename(origem, destino)
+            print(
+                f"[LEASE] {nome_original(origem)} pendente da execução anterior devolvido",
+                flush=True)
+
+
+def iniciar_coordenacao():
+    """
+    Renovação de leases e recuperação de arquivos e uploads (chamar no start,
+    antes do detector)
+    """
+    global _coordenacao_thread
+    if _coordenacao_thread is None or not _coordenacao_thread.is_alive():
+        _devolver_proprios()
+        _coordenacao_thread = threading.Thread(target=_loop_coordenacao, daemon=True)
+        _coordenacao_thread.start()
+        print(
+            f"[LEASE] Réplica {REPLICA_ID}: leases de {settings.lease_ttl}s em {CLAIMED_PATH}",
+            flush=True)
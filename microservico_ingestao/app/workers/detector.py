@@ -0,0 +1,162 @@
+import os
+import queue
+import threading
+import time
+from typing import Callable
+
+from app.core.config import settings
+from watchdog.events import FileSystemEventHandler
+from watchdog.observers.polling import PollingObserver
+
+
+class _Handler(FileSystemEventHandler):
+    def __init__(self, detector: "DetectorArquivos", inotify: bool):
+        self.detector = detector
+        self.inotify = inotify
+
+    # inotify: IN_CLOSE_WRITE / IN_MOVED_TO indicam arquivo completo
+    def on_closed(self, event):
+        if not event.is_directory:
+            self.detector.registrar(event.src_path)
+
+    def on_moved(self, event):
+        if not event.is_directory:
+            self.detector.registrar(event.dest_path)
+
+    # Polling não tem close-write: created/modified passam pela janela de estabilidade
+    def on_created(self, event):
+        if not self.inotify and not event.is_directory:
+            self.detector.registrar(event.src_path)
+
+    def on_modified(self, event):
+        if not self.inotify and not event.is_directory:
+            self.detector.registrar(event.src_path)
+
+
+class DetectorArquivos:
+    """
+    Observa uma pasta (inotify, com polling como fallback) e coloca na fila os
+    arquivos aceitos por `aceitar` depois que param de mudar (tamanho/mtime)
+    durante a janela de estabilidade.
+    """
+
+    def __init__(self, pasta: str, fila: queue.Queue, aceitar: Callable[[str], bool]):
+        self.pasta = pasta
+        self.fila = fila
+        self.aceitar = aceitar
+        self.modo = None
+        self._observer = None
+        self._janela = 0.0
+        self._candidatos: dict[str, tuple[tuple[int, int], float]] = {}
+        self._em_andamento: set[str] = set()
+        self._lock = threading.Lock()
+        self._acordar = threading.Event()
+        self._parar = threading.Event()
+
+    def iniciar(self):
+        modo = settings.watcher_mode
+        if modo in ("auto", "inotify"):
+            try:
+                from watchdog.observers.inotify import InotifyObserver
+
+                self._observer = InotifyObserver()
+                self._observer.schedule(
+                    _Handler(self, inotify=True), self.pasta, recursive=False)
+                self._observer.start()
+                self.modo = "inotify"
+                self._janela = settings.watcher_stable_ms / 1000
+            except Exception as e:
+                if modo == "inotify":
+                    raise
+                print(
+                    f"[SCAN] inotify indisponível ({e}); usando polling", flush=True)
+                self._observer = None
+
+        if self._observer is None:
+            self._observer = PollingObserver(timeout=settings.scan_interval)
+            self._observer.schedule(
+                _Handler(self, inotify=False), self.pasta, recursive=False)
+            self._observer.start()
+            self.modo = "polling"
+            self._janela = max(settings.watcher_stable_ms / 1000,
+                               settings.scan_interval)
+
+        threading.Thread(target=self._loop_estabilidade, daemon=True).start()
+        threading.Thread(target=self._loop_varredura, daemon=True).start()
+        print(
+            f"[SCAN] Monitorando {self.pasta} via {self.modo} "
+            f"(estabilidade {self._janela:.2f}s)", flush=True)
+
+    def parar(self):
+        self._parar.set()
+        self._acordar.set()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+
+    def registrar(self, path: str):
+        """Marca o arquivo como candidato (reinicia a janela de estabilidade)"""
+        path = os.path.abspath(path)
+        if os.path.dirname(path) != os.path.abspath(self.pasta) or not self.aceitar(path):
+            return
+        assinatura = self._assinatura(path)
+        if assinatura is None:
+            return
+        with self._lock:
+            if path in self._em_andamento:
+                return
+            anterior = self._candidatos.get(path)
+            if anterior is not None and anterior[0] == assinatura:
+                return
+            self._candidatos[path] = (assinatura, time.monotonic())
+        self._acordar.set()
+
+    def concluir(self, path: str):
+        """Libera o arquivo depois de processado (pode ser detectado de novo)"""
+        with self._lock:
+            self._em_andamento.discard(os.path.abspath(path))
+
+    def pendentes(self) -> int:
+        with self._lock:
+            return len(self._candidatos) + len(self._em_andamento)
+
+    @staticmethod
+    def _assinatura(path: str):
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return (st.st_size, st.st_mtime_ns)
+
+    def _loop_estabilidade(self):
+        while not self._parar.is_set():
+            with self._lock:
+                candidatos = list(self._candidatos.items())
+
+            agora = time.monotonic()
+            espera = 1.0
+            for path, (assinatura, desde) in candidatos:
+                atual = self._assinatura(path)
+                with self._lock:
+                    if atual is None:
+                        self._candidatos.pop(path, None)
+                    elif atual != assinatura:
+                        self._candidatos[path] = (atual, agora)
+                        espera = min(espera, self._janela)
+                    elif agora - desde >= self._janela:
+                        self._candidatos.pop(path, None)
+                        self._em_andamento.add(path)
+                        self.fila.put(path)
+                    else:
+                        espera = min(espera, self._janela - (agora - desde))
+
+            self._acordar.wait(timeout=max(espera, 0.01))
+            self._acordar.clear()
+
+    def _loop_varredura(self):
+        # Varredura inicial e periódica: pega arquivos anteriores ao start e
+        # eventos perdidos (ex.: overflow da fila do inotify)
+        while not self._parar.is_set():
+            for nome in os.listdir(self.pasta):
+                self.registrar(os.path.join(self.pasta, nome))
+            self._parar.wait(settings.watcher_rescan_interval)
@@ -1,18 +1,29 @@
 import os
+import queue
 import shutil
+import threading
 import time
-from datetime import datetime
+from datetime import datetime, timedelta
+from typing import Callable
 
-import pandas as pd
 from app.core.config import settings
 from app.core.database import SessionLocal
-from app.models.temp_models import ClienteTemp, CompraTemp, ProdutoTemp
-from app.tasks.publisher import publish_processed_data
-
-DATA_PATH = "/app/data"
-PROCESSED_PATH = os.path.join(DATA_PATH, "processed")
-
-os.makedirs(PROCESSED_PATH, exist_ok=True)
+from app.core.metrics import ARQUIVOS_DETECTADOS, BACKLOG_WATCHER
+from app.models.temp_models import LoteIngestao
+from app.services.outbox import enfileirar_compras
+from app.services.staging import registrar_vendas
+from app.workers.arquivos import (DATA_PATH, FAILED_PATH, PROCESSED_PATH,
+                                  QUARENTENA_PATH, arquivo_suportado,
+                                  extensao_suportada, hash_arquivo)
+from app.workers.coordenacao import (devolver, iniciar_coordenacao,
+                                     nome_original, reivindicar)
+from app.workers.detector import DetectorArquivos
+from app.workers.normalizer import (REQUIRED_COLUMNS, normalizar_vendas,
+                                    para_registros)
+from app.workers.pool import iniciar_pool
+from app.workers.readers import escolher_reader
+from sqlalchemy import func, or_, select, update
+from sqlalchemy.orm import Session
 
 
 def cleanup_processed_folder():
@@ -22,163 +33,320 @@ def cleanup_processed_folder():
     if len(files) > settings.processed_limit:
         files.sort(key=lambda f: os.path.getmtime(f))
         for f in files[:len(files) - settings.processed_limit]:
-            os.remove(f)
+            try:
+                os.remove(f)
+            except FileNotFoundError:
+                continue  # removido por outro worker do pool
             print(f"[CLEANUP] Removido arquivo antigo: {f}", flush=True)
 
 
-def safe_str(value):
-    return str(value).strip() if not pd.isna(value) else None
+class ArquivoInvalido(ValueError):
+    """Erro que não se resolve tentando de novo (vai direto para failed/)"""
+
+
+def _sem_extensao(file_path: str) -> str:
+    nome = nome_original(file_path)
+    ext = extensao_suportada(nome) or os.path.splitext(nome)[1]
+    return nome[:len(nome) - len(ext)]
+
+
+def _mover(file_path: str, pasta: str) -> str:
+    """Move para `pasta` com o nome original + timestamp, mantendo a extensão"""
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    ext = nome_original(file_path)[len(_sem_extensao(file_path)):]
+    dest_path = os.path.join(pasta, f"{_sem_extensao(file_path)}_{timestamp}{ext}")
+    shutil.move(file_path, dest_path)
+    return dest_path
+
+
+def _quarentenar(rejeitadas, destino: str):
+    """Acrescenta as linhas rejeitadas (colunas originais + linha + motivo) ao CSV"""
+    rejeitadas.to_csv(destino, mode="a", header=not os.path.exists(destino), index=False)
+
 
+def _registrar_falha(lote_id: str, erro: str, status: str = "erro"):
+    """Marca o lote como erro (mantém o checkpoint dos blocos já gravados)"""
+    with SessionLocal() as db:
+        lote = db.get(LoteIngestao, lote_id)
+        if lote is not None:
+            lote.status = status
+            lote.erro = erro[:500]
+            lote.finalizado_em = datetime.now()
+            db.commit()
 
-def process_excel(file_path: str):
-    """Processa arquivo Excel e insere dados no banco"""
+
+def _lote_para_retomar(db: Session, lote_id: str | None, arquivo_hash: str) -> LoteIngestao | None:
+    """
+    Lote já criado (upload) ou o último lote inacabado com o mesmo conteúdo.
+    A retomada é reivindicada com um UPDATE condicional: um lote "processando"
+    com checkpoint há menos de lease_ttl segundos está com outro job.
+    """
+    if lote_id:
+        return db.get(LoteIngestao, lote_id)
+    agora = datetime.now()
+    parado = or_(
+        LoteIngestao.status != "processando",
+        func.coalesce(LoteIngestao.checkpoint_em, LoteIngestao.iniciado_em)
+        < agora - timedelta(seconds=settings.lease_ttl))
+    candidatos = db.scalars(
+        select(LoteIngestao.id)
+        .where(LoteIngestao.arquivo_hash == arquivo_hash,
+               LoteIngestao.status != "concluido", parado)
+        .order_by(LoteIngestao.criado_em.desc())
+        .limit(5)
+    ).all()
+    for candidato in candidatos:
+        reivindicado = db.execute(
+            update(LoteIngestao)
+            .where(LoteIngestao.id == candidato, parado)
+            .values(status="processando", checkpoint_em=agora)
+        ).rowcount
+        if reivindicado:
+            return db.get(LoteIngestao, candidato)
+    return None
+
+
+def _data_hora_base(db: Session, arquivo_hash: str, excluir: str | None) -> datetime | None:
+    """Base de data_hora do primeiro lote com o mesmo conteúdo (None se é o primeiro)"""
+    base = func.coalesce(LoteIngestao.data_hora_base, LoteIngestao.iniciado_em)
+    consulta = (select(base)
+                .where(LoteIngestao.arquivo_hash == arquivo_hash, base.is_not(None))
+                .order_by(LoteIngestao.criado_em)
+                .limit(1))
+    if excluir is not None:
+        consulta = consulta.where(LoteIngestao.id != excluir)
+    return db.scalars(consulta).first()
+
+
+def process_excel(file_path: str, progresso: Callable[..., None] | None = None,
+                  lote_id: str | None = None) -> dict:
+    """
+    Processa a planilha em blocos e insere os dados no banco.
+    `progresso(**dados)` é chamado a cada bloco; retorna o resumo do arquivo.
+    Com `lote_id` usa o lote já existente em vez de criar um novo.
+    Cada bloco é uma transação com o checkpoint do lote: depois de uma queda,
+    o mesmo arquivo retoma a partir da última linha confirmada.
+    """
+    progresso = progresso or (lambda **dados: None)
+    inicio = time.monotonic()
+    # Segundos acumulados por etapa (vão para as métricas no processo principal)
+    etapas = {"leitura": 0.0, "normalizacao": 0.0, "gravacao": 0.0}
+    resumo = {"arquivo": file_path, "status": "erro", "linhas": 0,
+              "rejeitadas": 0, "compras": 0, "duplicadas": 0, "etapas": etapas}
+    lote_atual = lote_id
+    tentativas = 0
     try:
-        df = pd.read_excel(file_path)
-
-        required_cols = {
-            "nome", "email", "telefone", "endereco_completo",
-            "cpf_cnpj", "produto", "quantidade",
-            "valor_unitario", "forma_pagamento"
-        }
-        if not required_cols.issubset(df.columns):
-            print(
-                f"[ERRO] Arquivo {file_path} inválido. Colunas obrigatórias faltando!", flush=True)
-            return
+        reader = escolher_reader(file_path)
+        print(
+            f"[LEITURA] {file_path} via {reader.nome} (blocos de {settings.reader_chunk_size})", flush=True)
+        arquivo_hash = hash_arquivo(file_path)
 
         with SessionLocal() as db:
             with db.begin():
-                for _, row in df.iterrows():
-                    nome = safe_str(row["nome"])
-                    email = safe_str(row["email"])
-                    telefone = safe_str(row["telefone"])
-                    endereco = safe_str(row["endereco_completo"])
-                    cpf_cnpj = safe_str(row["cpf_cnpj"])
-
-                    cliente = None
-                    if cpf_cnpj:
-                        cliente = db.query(ClienteTemp).filter_by(
-                            cpf_cnpj=cpf_cnpj).first()
-                    if not cliente:
-                        cliente = db.query(ClienteTemp).filter_by(
-                            nome=nome).first()
-                    if not cliente:
-                        cliente = ClienteTemp(
-                            nome=nome,
-                            email=email,
-                            telefone=telefone,
-                            cpf_cnpj=cpf_cnpj,
-                            endereco_completo=endereco
-                        )
-                        db.add(cliente)
-                        db.flush()
-
-                    produto_nome = str(row["produto"]).strip()
-                    produto = db.query(ProdutoTemp).filter_by(
-                        nome_produto=produto_nome).first()
-                    if not produto:
-                        produto = ProdutoTemp(nome_produto=produto_nome)
-                        db.add(produto)
-                        db.flush()
-
-                    try:
-                        quantidade = int(row["quantidade"])
-                        valor_unitario = float(row["valor_unitario"])
-                    except (ValueError, TypeError) as err:
-                        print(
-                            f"[ERRO] Valores inválidos na linha: {row} -> {err}", flush=True)
-                        continue
-
-                    compra = CompraTemp(
-                        cliente_id=cliente.id,
-                        produto_id=produto.id,
-                        quantidade=quantidade,
-                        valor_unitario=valor_unitario,
-                        valor_total=quantidade * valor_unitario,
-                        data_hora=datetime.now(),
-                        forma_pagamento=str(row["forma_pagamento"]).strip()
-                    )
-                    db.add(compra)
-            print(
-                f"[OK] {len(df)} vendas importadas de {file_path}", flush=True)
-
-            # Buscar os dados já persistidos no banco TEMP
-            clientes = db.query(ClienteTemp).all()
-            produtos = db.query(ProdutoTemp).all()
-            compras = db.query(CompraTemp).all()
+                lote = _lote_para_retomar(db, lote_id, arquivo_hash)
+                if lote is None:
+                    lote = LoteIngestao(arquivo=nome_original(file_path))
+                    db.add(lote)
+                lote.arquivo_hash = arquivo_hash
+                if lote.status == "falhou":
+                    lote.tentativas = 0  # devolvido à pasta manualmente: nova rodada
+                tentativas = lote.tentativas or 0
+                esgotado = tentativas >= settings.ingest_max_tentativas
+                if not esgotado:
+                    lote.tentativas = tentativas = tentativas + 1
+                lote.status = "processando"
+                lote.erro = None
+                if lote.data_hora_base is None:
+                    # Lote com blocos já gravados antes desta coluna: a base era iniciado_em
+                    lote.data_hora_base = (
+                        lote.iniciado_em if lote.linhas_processadas
+                        else _data_hora_base(db, arquivo_hash, lote.id)) or datetime.now()
+                lote.iniciado_em = lote.iniciado_em or datetime.now()
+                lote.checkpoint_em = datetime.now()
+                db.flush()
 
-            # Buscar os dados já persistidos no banco TEMP
-            clientes = db.query(ClienteTemp).all()
-            produtos = db.query(ProdutoTemp).all()
-            compras = db.query(CompraTemp).all()
+                lote_atual = lote.id
+                # Mesmo data_hora base na retomada e no reenvio do arquivo: as
+                # linhas sem data_hora própria geram as mesmas chaves de dedup
+                data_hora = lote.data_hora_base
+                retomar = lote.linhas_processadas or 0
+                total = lote.total_compras or 0
+                duplicadas_total = lote.compras_duplicadas or 0
+                rejeitadas_total = lote.linhas_rejeitadas or 0
+                quarentena = lote.arquivo_quarentena or os.path.join(
+                    QUARENTENA_PATH, f"{_sem_extensao(file_path)}_{lote_atual}.csv")
 
-            # Index para montar o payload de cada compra
-            cli_idx = {c.id: c for c in clientes}
-            prod_idx = {p.id: p for p in produtos}
+            resumo["lote_id"] = lote_atual
+            if esgotado:
+                # As tentativas anteriores não chegaram ao except (worker morto,
+                # réplica reiniciada): não lê o arquivo de novo
+                raise ArquivoInvalido(
+                    f"Arquivo {file_path} não concluído em {tentativas} tentativa(s)")
+            progresso(etapa="lendo", lote_id=lote_atual, tentativas=tentativas)
+            if retomar:
+                print(
+                    f"[CHECKPOINT] Retomando lote {lote_atual} de {file_path} "
+                    f"após a linha {retomar}", flush=True)
+            resumo["retomado_de"] = retomar
+            anteriores = (total, rejeitadas_total, duplicadas_total)
+            registradas = total + duplicadas_total
+            linhas = 0
+            marca = time.perf_counter()
+            for df in reader.ler(file_path, settings.reader_chunk_size):
+                lido = time.perf_counter()
+                etapas["leitura"] += lido - marca
+                marca = lido
+                if not REQUIRED_COLUMNS.issubset(df.columns):
+                    raise ArquivoInvalido(
+                        f"Arquivo {file_path} inválido. Colunas obrigatórias faltando: "
+                        f"{sorted(REQUIRED_COLUMNS - set(df.columns))}")
 
-            # Publica UMA mensagem por compra
-            for cp in compras:
-                c = cli_idx.get(cp.cliente_id)
-                p = prod_idx.get(cp.produto_id)
+                inicio_bloco, linhas = linhas, linhas + len(df)
+                if linhas <= retomar:
+                    continue  # bloco já confirmado numa execução anterior
+                if inicio_bloco < retomar:
+                    df = df.iloc[retomar - inicio_bloco:]
 
-                if not c or not p:
-                    print(
-                        f"[WARN] Cliente/Produto não encontrado para compra {cp.id}", flush=True)
-                    continue
-
-                payload = {
-                    "cliente": {
-                        "nome": c.nome,
-                        "email": c.email,
-                        "telefone": c.telefone,
-                        "cpf_cnpj": c.cpf_cnpj,
-                        "endereco_completo": c.endereco_completo,
-                    },
-                    "produto": {
-                        # o parser do Django já converte nome_produto -> nome
-                        "nome_produto": p.nome_produto,
-                    },
-                    "quantidade": int(cp.quantidade),
-                    "valor_unitario": float(cp.valor_unitario),
-                    "valor_total": float(cp.valor_total),
-                    "data_hora": cp.data_hora.isoformat(),  # o parser no Django torna aware
-                    "forma_pagamento": cp.forma_pagamento,
-                }
-
-                # Enviar para RabbitMQ via Celery (publisher puro)
-                try:
-                    task_id = publish_processed_data(payload)
-                    print(
-                        f"[INFO] Publicado no RabbitMQ (processed_data). task_id={task_id}", flush=True)
-                except Exception as e:
+                validas, rejeitadas = normalizar_vendas(df)
+                normalizado = time.perf_counter()
+                etapas["normalizacao"] += normalizado - lido
+                if len(rejeitadas):
+                    rejeitadas_total += len(rejeitadas)
+                    # Antes do commit do bloco: numa queda entre os dois, a
+                    # retomada pode repetir linhas na quarentena, nunca perdê-las
+                    _quarentenar(rejeitadas, quarentena)
+                    motivos = rejeitadas["motivo"].value_counts().to_dict()
                     print(
-                        f"[ERRO] Falha ao publicar compra {cp.id}: {e}", flush=True)
+                        f"[QUARENTENA] {len(rejeitadas)} linhas inválidas em {file_path} "
+                        f"-> {quarentena}: {motivos}", flush=True)
 
-            print("[INFO] Todas as compras foram publicadas no RabbitMQ", flush=True)
+                with db.begin():
+                    # Offset em data_hora segue as linhas válidas do arquivo
+                    # (só para linhas sem data_hora própria)
+                    compra_ids = registrar_vendas(
+                        db, para_registros(validas), data_hora + timedelta(microseconds=registradas),
+                        lote_id=lote_atual)
+                    # Outbox na mesma transação: publicação garantida pelo relay
+                    enfileiradas, duplicadas = enfileirar_compras(db, compra_ids)
 
-        print("[INFO] Payload normalizado enviado para RabbitMQ", flush=True)
+                    registradas += len(compra_ids)
+                    total += enfileiradas
+                    duplicadas_total += len(duplicadas)
+                    lote = db.get(LoteIngestao, lote_atual)
+                    lote.total_compras = total
+                    lote.compras_duplicadas = duplicadas_total
+                    lote.linhas_processadas = linhas
+                    lote.linhas_rejeitadas = rejeitadas_total
+                    lote.checkpoint_em = datetime.now()
+                    if len(rejeitadas):
+                        lote.arquivo_quarentena = quarentena
+                marca = time.perf_counter()
+                etapas["gravacao"] += marca - normalizado
+                # "bloco": linhas só deste bloco, para as métricas
+                progresso(etapa="gravando", linhas=linhas, rejeitadas=rejeitadas_total,
+                          compras=total, duplicadas=duplicadas_total,
+                          bloco=(len(validas), len(rejeitadas), len(duplicadas)))
 
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        dest_path = os.path.join(
-            PROCESSED_PATH, f"{os.path.splitext(os.path.basename(file_path))[0]}_{timestamp}.xlsx")
-        shutil.move(file_path, dest_path)
+            with db.begin():
+                lote = db.get(LoteIngestao, lote_atual)
+                lote.status = "concluido"
+                lote.finalizado_em = datetime.now()
+            # Resumo (e métricas) só do que foi processado nesta execução
+            resumo.update(linhas=linhas - retomar, rejeitadas=rejeitadas_total - anteriores[1],
+                          compras=total - anteriores[0],
+                          duplicadas=duplicadas_total - anteriores[2], status="concluido")
+            print(
+                f"[OK] {total} vendas importadas de {file_path} "
+                f"(lote {lote_atual}, {rejeitadas_total} rejeitadas, {duplicadas_total} duplicadas); "
+                "publicação via outbox", flush=True)
+
+        dest_path = _mover(file_path, PROCESSED_PATH)
         print(f"[MOVIDO] {file_path} -> {dest_path}", flush=True)
 
         cleanup_processed_folder()
 
     except Exception as e:
+        resumo["erro"] = str(e)
         print(f"[ERRO] Falha ao processar {file_path}: {e}", flush=True)
+        # Upload não volta para a pasta monitorada: a primeira falha é definitiva
+        definitiva = (isinstance(e, ArquivoInvalido) or lote_id is not None
+                      or tentativas >= settings.ingest_max_tentativas)
+        if definitiva and os.path.exists(file_path):
+            dest_path = _mover(file_path, FAILED_PATH)
+            resumo["status"] = "falhou"
+            print(
+                f"[FALHOU] {file_path} -> {dest_path} após {tentativas} tentativa(s)", flush=True)
+        if lote_atual:
+            # Checkpoint preservado: a próxima tentativa retoma deste ponto
+            _registrar_falha(lote_atual, str(e), resumo["status"])
+
+    resumo["tentativas"] = tentativas
+    resumo["duracao"] = time.monotonic() - inicio
+    return resumo
+
+
+# Falhas seguidas de arquivos que caíram antes de ter lote (ex.: banco fora)
+_falhas_sem_lote: dict[str, int] = {}
+_falhas_lock = threading.Lock()
+
+
+def _devolver_com_espera(path: str, resumo: dict):
+    """
+    Arquivo que falhou (continua em claimed/, com o lease renovado) volta para
+    a pasta depois de uma espera que cresce a cada tentativa; a nova tentativa
+    retoma do checkpoint do lote.
+    """
+    nome = nome_original(path)
+    if not os.path.exists(path):
+        # Concluído ou em failed/
+        with _falhas_lock:
+            _falhas_sem_lote.pop(nome, None)
+        return
+
+    tentativas = resumo.get("tentativas")
+    if not tentativas:
+        # Sem lote o contador não está no banco: conta aqui
+        with _falhas_lock:
+            tentativas = _falhas_sem_lote[nome] = _falhas_sem_lote.get(nome, 0) + 1
+            if tentativas >= settings.ingest_max_tentativas:
+                del _falhas_sem_lote[nome]
+        if tentativas >= settings.ingest_max_tentativas:
+            dest_path = _mover(path, FAILED_PATH)
+            print(
+                f"[FALHOU] {path} -> {dest_path} após {tentativas} tentativa(s)", flush=True)
+            return
+
+    espera = min(settings.ingest_backoff_base * 2 ** (tentativas - 1),
+                 settings.ingest_backoff_max)
+    print(f"[RETRY] {nome}: nova tentativa em {espera:.0f}s", flush=True)
+    timer = threading.Timer(espera, devolver, args=(path,))
+    timer.daemon = True
+    timer.start()
 
 
 def start_file_watcher():
-    """Loop para monitorar DATA_PATH e processar novos arquivos"""
-    print(
-        f"[SCAN] Monitorando {DATA_PATH} a cada {settings.scan_interval}s...", flush=True)
+    """
+    Envia ao pool de ingestão os arquivos prontos detectados em DATA_PATH.
+    Várias réplicas podem observar a mesma pasta: cada arquivo é reivindicado
+    (movido para claimed/<replica>) antes de ir para o pool.
+    """
+    fila = queue.Queue()
+    detector = DetectorArquivos(DATA_PATH, fila, arquivo_suportado)
+    pool = iniciar_pool()
+    BACKLOG_WATCHER.set_function(detector.pendentes)
+    iniciar_coordenacao()
+    detector.iniciar()
 
     while True:
-        time.sleep(settings.scan_interval)
-        for f in os.listdir(DATA_PATH):
-            if f.endswith(".xlsx"):
-                full_path = os.path.join(DATA_PATH, f)
-                print(
-                    f"[DETECTADO] Arquivo encontrado: {full_path}", flush=True)
-                process_excel(full_path)
+        full_path = fila.get()
+        reivindicado = reivindicar(full_path)
+        # Saiu da pasta (para cá ou para outra réplica): o nome pode voltar a ser detectado
+        detector.concluir(full_path)
+        if reivindicado is None:
+            print(
+                f"[DETECTADO] {full_path} já reivindicado por outra réplica", flush=True)
+            continue
+        print(
+            f"[DETECTADO] Arquivo encontrado: {full_path}", flush=True)
+        ARQUIVOS_DETECTADOS.labels("watcher").inc()
+        pool.submeter(reivindicado, ao_concluir=_devolver_com_espera)
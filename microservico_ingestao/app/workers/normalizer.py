@@ -0,0 +1,150 @@
+import numpy as np
+import pandas as pd
+from app.core.config import settings
+
+REQUIRED_COLUMNS = {
+    "nome", "email", "telefone", "endereco_completo",
+    "cpf_cnpj", "produto", "quantidade",
+    "valor_unitario", "forma_pagamento"
+}
+
+TEXT_COLUMNS = (
+    "nome", "email", "telefone", "endereco_completo",
+    "cpf_cnpj", "produto", "forma_pagamento"
+)
+
+# Tamanho das colunas String em temp_models: valor maior derrubaria o INSERT
+# do bloco inteiro no Postgres, então a linha é rejeitada aqui
+TAMANHO_MAXIMO = {
+    "nome": 255, "email": 255, "telefone": 50, "endereco_completo": 255,
+    "cpf_cnpj": 20, "produto": 255, "forma_pagamento": 50,
+}
+
+# Faixas numéricas pelo mesmo motivo: quantidade vai para uma coluna Integer
+# (int32 no Postgres) e os valores para DecimalField(max_digits=12,
+# decimal_places=2) no consumidor (abaixo de 10^10)
+QUANTIDADE_MAXIMA = 2**31 - 1
+VALOR_MAXIMO = 10**10
+
+
+def _texto(serie: pd.Series) -> pd.Series:
+    """Normaliza uma coluna inteira para texto sem espaços nas bordas (vazio -> NA)"""
+    if pd.api.types.is_float_dtype(serie):
+        # CPF/telefone lidos como float por causa de células vazias viram
+        # "12345678901.0"; quando todos os valores são inteiros, remove o ".0"
+        validos = serie.dropna()
+        if (validos == np.floor(validos)).all():
+            serie = serie.astype("Int64")
+
+    texto = serie.astype("string").str.strip()
+    return texto.mask(texto == "")
+
+
+def _data_hora(serie: pd.Series) -> pd.Series:
+    """
+    Coluna opcional data_hora -> datetime sem fuso, no fuso do consumidor
+    (horários com offset são convertidos). Não interpretável -> NaT.
+    """
+    if not pd.api.types.is_datetime64_any_dtype(serie):
+        texto = _texto(serie)
+        try:
+            serie = pd.to_datetime(texto, errors="coerce", format="mixed")
+        except ValueError:
+            # Fusos diferentes (ou com e sem fuso) no mesmo bloco: valor a valor
+            return pd.to_datetime(texto.map(_sem_fuso, na_action="ignore"))
+
+    if isinstance(serie.dtype, pd.DatetimeTZDtype):
+        serie = serie.dt.tz_convert(settings.consumidor_timezone).dt.tz_localize(None)
+    return serie
+
+
+def _sem_fuso(valor: str):
+    try:
+        ts = pd.Timestamp(valor)
+    except ValueError:
+        return pd.NaT
+    if ts.tzinfo is not None:
+        ts = ts.tz_convert(settings.consumidor_timezone).tz_localize(None)
+    return ts
+
+
+def normalizar_vendas(df: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Normaliza e valida o DataFrame coluna a coluna.
+    Retorna (validas, rejeitadas); as rejeitadas trazem a coluna "motivo".
+    A coluna "linha" vem do índice (numeração global dada pelo reader).
+    "data_hora" é opcional: vazia fica None (vale o horário da ingestão).
+    """
+    out = pd.DataFrame(index=df.index)
+    out["linha"] = df.index.to_numpy()
+
+    for col in TEXT_COLUMNS:
+        out[col] = _texto(df[col])
+
+    if "data_hora" in df.columns:
+        out["data_hora"] = _data_hora(df["data_hora"])
+        data_hora_invalida = (out["data_hora"].isna() & df["data_hora"].notna()
+                              & (df["data_hora"].astype("string").str.strip() != ""))
+    else:
+        data_hora_invalida = pd.Series(False, index=df.index)
+
+    quantidade = pd.to_numeric(df["quantidade"], errors="coerce")
+    qtd = quantidade.to_numpy(dtype="float64", na_value=np.nan)
+    valor_unitario = pd.to_numeric(df["valor_unitario"], errors="coerce")
+    valor = valor_unitario.to_numpy(dtype="float64", na_value=np.nan)
+    longos = [(col, (out[col].str.len() > limite).fillna(False).to_numpy(dtype=bool))
+              for col, limite in TAMANHO_MAXIMO.items()]
+
+    # Primeira regra que falhar define o motivo da rejeição
+    motivo = pd.Series(
+        np.select(
+            [
+                out["nome"].isna().to_numpy(),
+                out["produto"].isna().to_numpy(),
+                ~np.isfinite(qtd),
+                qtd != np.floor(qtd),
+                qtd <= 0,
+                qtd > QUANTIDADE_MAXIMA,
+                ~np.isfinite(valor),
+                valor < 0,
+                valor >= VALOR_MAXIMO,
+                qtd * valor >= VALOR_MAXIMO,
+                data_hora_invalida.to_numpy(dtype=bool),
+                *(mascara for _, mascara in longos),
+            ],
+            [
+                "nome vazio",
+                "produto vazio",
+                "quantidade inválida",
+                "quantidade deve ser inteira",
+                "quantidade deve ser > 0",
+                f"quantidade acima de {QUANTIDADE_MAXIMA}",
+                "valor_unitario inválido",
+                "valor_unitario negativo",
+                f"valor_unitario acima de {VALOR_MAXIMO}",
+                f"valor_total acima de {VALOR_MAXIMO}",
+                "data_hora inválida",
+                *(f"{col} excede {TAMANHO_MAXIMO[col]} caracteres" for col, _ in longos),
+            ],
+            default="",
+        ),
+        index=df.index,
+    )
+    invalidas = motivo != ""
+
+    rejeitadas = df.loc[invalidas].copy()
+    rejeitadas["linha"] = out.loc[invalidas, "linha"]
+    rejeitadas["motivo"] = motivo[invalidas]
+
+    validas = out.loc[~invalidas].copy()
+    validas["quantidade"] = quantidade[~invalidas].astype("int64")
+    validas["valor_unitario"] = valor_unitario[~invalidas].astype("float64")
+    validas["valor_total"] = validas["quantidade"] * validas["valor_unitario"]
+    validas["forma_pagamento"] = validas["forma_pagamento"].fillna("OUTROS")
+
+    return validas, rejeitadas
+
+
+def para_registros(df: pd.DataFrame) -> list[dict]:
+    """Converte o DataFrame em dicts com None no lugar de NA/NaN"""
+    return df.astype(object).where(df.notna(), None).to_dict("records")
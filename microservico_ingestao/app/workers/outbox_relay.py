@@ -0,0 +1,73 @@
+import threading
+import time
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.metrics import ETAPA_DURACAO
+from app.services.outbox import marcar_enviadas, marcar_falha, reservar_pendentes
+from app.tasks.publisher import agrupar_em_lotes, publish_many
+from app.workers.backpressure import controle_vazao
+
+_relay_thread = None
+
+
+def drenar_outbox(limite: int | None = None) -> int:
+    """
+    Publica um bloco de mensagens pendentes da outbox, agrupadas em mensagens
+    de lote. Retorna quantas foram enviadas (0 = nada pronto para envio).
+    """
+    limite = limite or settings.outbox_batch_size
+    inicio = time.perf_counter()
+    with SessionLocal() as db:
+        with db.begin():
+            mensagens = reservar_pendentes(db, limite)
+            if not mensagens:
+                return 0
+
+            grupos = list(agrupar_em_lotes(m.payload for m in mensagens))
+            confirmados = publish_many(grupos)
+
+            enviadas, pos = [], 0
+            for grupo, ok in zip(grupos, confirmados):
+                bloco = mensagens[pos:pos + len(grupo)]
+                pos += len(grupo)
+                if ok:
+                    enviadas.extend(bloco)
+                else:
+                    marcar_falha(bloco, RuntimeError("publicação não confirmada pelo broker"))
+
+            falhas = len(mensagens) - len(enviadas)
+            print(
+                f"[OUTBOX] {len(enviadas)} compras publicadas em {len(grupos)} mensagens"
+                + (f"; {falhas} reagendadas" if falhas else ""), flush=True)
+
+            marcar_enviadas(db, enviadas)
+        ETAPA_DURACAO.labels("publicacao").observe(time.perf_counter() - inicio)
+        return len(enviadas)
+
+
+def _loop_relay():
+    controle = controle_vazao()
+    while True:
+        try:
+            fator = controle.avaliar()
+            if fator == 0:
+                # Pausado: só volta a publicar quando a fila baixar
+                time.sleep(settings.backpressure_check_interval)
+                continue
+            limite = max(1, int(settings.outbox_batch_size * fator))
+            # Drena em sequência enquanto houver mensagens prontas; com vazão
+            # reduzida, blocos menores espaçados pelo intervalo do relay
+            if drenar_outbox(limite) and fator == 1:
+                continue
+        except Exception as e:
+            print(f"[OUTBOX] Erro no relay: {e}", flush=True)
+        time.sleep(settings.outbox_poll_interval)
+
+
+def iniciar_relay():
+    global _relay_thread
+    if _relay_thread is None or not _relay_thread.is_alive():
+        _relay_thread = threading.Thread(target=_loop_relay, daemon=True)
+        _relay_thread.start()
+        print("[OUTBOX] Relay iniciado em background!", flush=True)
@@ -0,0 +1,202 @@
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable
+
+from app.core.config import settings
+from app.core.metrics import BACKLOG_POOL, registrar_bloco, registrar_resumo
+
+# Fila de progresso do processo atual (definida pelo initializer do pool)
+_fila_progresso = None
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _inicializar(fila):
+    global _fila_progresso
+    _fila_progresso = fila
+
+
+def _processar(path: str, lote_id: str | None = None) -> dict:
+    from app.workers.file_watcher import process_excel
+
+    def progresso(**dados):
+        _fila_progresso.put((path, dados))
+
+    progresso(etapa="lendo")
+    return process_excel(path, progresso=progresso, lote_id=lote_id)
+
+
+def _cpus() -> int:
+    # Respeita o limite de CPUs do container (cpuset)
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+class PoolIngestao:
+    """
+    Processa arquivos em paralelo (processos ou threads) com limite de
+    concorrência. Cada arquivo é uma tarefa isolada: a falha de um não
+    bloqueia os demais. O progresso de cada arquivo fica em snapshot().
+    """
+
+    HISTORICO = 200  # arquivos finalizados mantidos no snapshot
+
+    def __init__(self, workers: int | None = None, modo: str | None = None):
+        self.workers = workers or settings.ingest_workers or _cpus()
+        self.modo = modo or settings.ingest_pool_mode
+        if self.modo not in ("process", "thread"):
+            raise ValueError(f"ingest_pool_mode desconhecido: {self.modo}")
+
+        if self.modo == "process":
+            # spawn: o processo do watcher tem threads (uvicorn, observer)
+            self._ctx = multiprocessing.get_context("spawn")
+            self._fila = self._ctx.Queue()
+        else:
+            self._fila = queue.Queue()
+
+        self._lock = threading.Lock()
+        self._arquivos: OrderedDict[str, dict] = OrderedDict()
+        self._executor = self._criar_executor()
+        threading.Thread(target=self._loop_progresso, daemon=True).start()
+
+    def _criar_executor(self):
+        if self.modo == "process":
+            return ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=self._ctx,
+                initializer=_inicializar, initargs=(self._fila,))
+        return ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix="ingest",
+            initializer=_inicializar, initargs=(self._fila,))
+
+    def submeter(self, path: str, ao_concluir: Callable[[str, dict], None] | None = None,
+                  lote_id: str | None = None) -> Future:
+        """
+        `lote_id`: lote já criado (ex.: upload) que o processamento deve usar.
+        `ao_concluir(path, resumo)` roda no fim, com sucesso ou falha.
+        """
+        with self._lock:
+            self._arquivos.pop(path, None)
+            self._arquivos[path] = {"estado": "pendente", "enfileirado_em": time.time(),
+                                    "lote_id": lote_id}
+
+        executor = self._executor
+        try:
+            fut = executor.submit(_processar, path, lote_id)
+        except BrokenProcessPool:
+            # Um worker morreu (OOM, segfault): recria o pool e segue
+            fut = self._recriar_executor(executor).submit(_processar, path, lote_id)
+
+        fut.add_done_callback(lambda f: self._finalizar(path, f, ao_concluir))
+        return fut
+
+    def _recriar_executor(self, quebrado):
+        """Troca o executor quebrado uma vez só, mesmo com submissões concorrentes"""
+        with self._lock:
+            recriado = self._executor is quebrado
+            if recriado:
+                print("[POOL] Pool quebrado, recriando workers", flush=True)
+                self._executor = self._criar_executor()
+            executor = self._executor
+        if recriado:
+            # Fora do lock: cancelar futures dispara _finalizar, que usa o lock
+            quebrado.shutdown(wait=False, cancel_futures=True)
+        return executor
+
+    def _finalizar(self, path: str, fut: Future, ao_concluir):
+        try:
+            resumo = fut.result()
+            estado = "concluido" if resumo.get("status") == "concluido" else "erro"
+        except Exception as e:
+            with self._lock:
+                info = self._arquivos.get(path, {})
+                # Lote e tentativa que o worker informou antes de cair
+                resumo = {k: info[k] for k in ("lote_id", "tentativas") if info.get(k)}
+            resumo["erro"] = f"{type(e).__name__}: {e}"
+            estado = "erro"
+            print(f"[POOL] Falha no worker ao processar {path}: {e}", flush=True)
+            if resumo.get("lote_id"):
+                # O worker não chegou a marcar o lote: libera para a retomada
+                from app.workers.file_watcher import _registrar_falha
+                try:
+                    _registrar_falha(resumo["lote_id"], resumo["erro"])
+                except Exception as erro:
+                    print(f"[POOL] Lote {resumo['lote_id']} não marcado: {erro}", flush=True)
+
+        registrar_resumo({"status": estado, **resumo})
+
+        with self._lock:
+            info = self._arquivos.setdefault(path, {})
+            info.update(resumo)
+            info.update(estado=estado, finalizado_em=time.time())
+            finalizados = [p for p, i in self._arquivos.items()
+                           if i["estado"] in ("concluido", "erro")]
+            for antigo in finalizados[:-self.HISTORICO]:
+                del self._arquivos[antigo]
+
+        if ao_concluir:
+            ao_concluir(path, resumo)
+
+    def _loop_progresso(self):
+        while True:
+            path, dados = self._fila.get()
+            bloco = dados.pop("bloco", None)
+            if bloco is not None:
+                registrar_bloco(*bloco)
+            with self._lock:
+                info = self._arquivos.get(path)
+                if info is None or info["estado"] in ("concluido", "erro"):
+                    continue
+                if info["estado"] == "pendente":
+                    info.update(estado="processando", iniciado_em=time.time())
+                info.update(dados)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            arquivos = {p: dict(i) for p, i in self._arquivos.items()}
+        contagem = {}
+        for info in arquivos.values():
+            contagem[info["estado"]] = contagem.get(info["estado"], 0) + 1
+        return {"modo": self.modo, "workers": self.workers,
+                "contagem": contagem, "arquivos": arquivos}
+
+    def progresso_lote(self, lote_id: str) -> dict | None:
+        """Progresso em memória do arquivo ligado ao lote (None se não está no pool)"""
+        with self._lock:
+            for info in reversed(self._arquivos.values()):
+                if info.get("lote_id") == lote_id:
+                    return dict(info)
+        return None
+
+    def em_andamento(self) -> list[str]:
+        """Arquivos pendentes ou em processamento neste pool"""
+        with self._lock:
+            return [p for p, i in self._arquivos.items()
+                    if i["estado"] in ("pendente", "processando")]
+
+    def backlog(self) -> int:
+        return len(self.em_andamento())
+
+
+def iniciar_pool() -> PoolIngestao:
+    global _pool
+    # Watcher e API (uploads) podem chamar ao mesmo tempo no start
+    with _pool_lock:
+        if _pool is None:
+            _pool = PoolIngestao()
+            BACKLOG_POOL.set_function(_pool.backlog)
+            print(
+                f"[POOL] {_pool.workers} workers ({_pool.modo}) para ingestão", flush=True)
+    return _pool
+
+
+def pool_atual() -> PoolIngestao | None:
+    return _pool
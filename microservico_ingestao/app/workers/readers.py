@@ -0,0 +1,151 @@
+import os
+from abc import ABC, abstractmethod
+from itertools import islice
+from typing import Iterator
+
+import pandas as pd
+from app.core.config import settings
+
+
+class PlanilhaReader(ABC):
+    """
+    Lê uma planilha em blocos de linhas (DataFrames).
+    O índice de cada bloco continua a numeração do anterior (linha global).
+    """
+
+    nome = "base"
+
+    @abstractmethod
+    def ler(self, file_path: str, chunk_size: int) -> Iterator[pd.DataFrame]:
+        ...
+
+
+class OpenpyxlStreamReader(PlanilhaReader):
+    """Modo read-only do openpyxl: memória limitada ao tamanho do bloco"""
+
+    nome = "openpyxl_stream"
+
+    def ler(self, file_path: str, chunk_size: int) -> Iterator[pd.DataFrame]:
+        from openpyxl import load_workbook
+
+        wb = load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            rows = wb.active.iter_rows(values_only=True)
+            header = next(rows, None)
+            if header is None:
+                return
+            colunas = [str(c).strip() if c is not None else "" for c in header]
+
+            # Linhas sem nenhum valor (ex.: só formatação no fim da planilha)
+            # são puladas, como nos demais readers; o índice segue a linha
+            preenchidas = ((i, row) for i, row in enumerate(rows)
+                           if any(c is not None for c in row))
+            while True:
+                bloco = list(islice(preenchidas, chunk_size))
+                if not bloco:
+                    break
+                indices, valores = zip(*bloco)
+                yield pd.DataFrame(list(valores), columns=colunas, index=pd.Index(indices))
+        finally:
+            wb.close()
+
+
+class CalamineReader(PlanilhaReader):
+    """
+    Leitura completa via python-calamine (Rust), bem mais rápida que o
+    openpyxl para arquivos pequenos e médios. Sem o pacote, usa o openpyxl.
+    """
+
+    nome = "calamine"
+
+    def ler(self, file_path: str, chunk_size: int) -> Iterator[pd.DataFrame]:
+        try:
+            import python_calamine  # noqa: F401
+            engine = "calamine"
+        except ImportError:
+            engine = "openpyxl"
+
+        # Sem linhas totalmente vazias (o índice segue a linha da planilha)
+        df = pd.read_excel(file_path, engine=engine).dropna(how="all")
+        df.columns = [str(c).strip() for c in df.columns]
+        for inicio in range(0, max(len(df), 1), chunk_size):
+            yield df.iloc[inicio:inicio + chunk_size]
+
+
+class CsvReader(PlanilhaReader):
+    """
+    CSV (ou .csv.gz, compressão detectada pela extensão) lido em blocos pelo
+    parser C do pandas. Tudo como texto: CPF/telefone mantêm zeros à esquerda
+    e os números passam pelo mesmo pd.to_numeric do normalizador.
+    """
+
+    nome = "csv"
+
+    def ler(self, file_path: str, chunk_size: int) -> Iterator[pd.DataFrame]:
+        blocos = pd.read_csv(
+            file_path, sep=settings.csv_sep, encoding=settings.csv_encoding,
+            dtype=str, chunksize=chunk_size)
+        with blocos:
+            for df in blocos:
+                # Índice do read_csv já segue a linha global do arquivo;
+                # linhas só com separadores (",,,") são puladas
+                df.columns = [str(c).strip() for c in df.columns]
+                yield df.dropna(how="all")
+
+
+class ParquetReader(PlanilhaReader):
+    """Parquet lido por row group/lote via pyarrow (colunar, sem o arquivo todo em memória)"""
+
+    nome = "parquet"
+
+    def ler(self, file_path: str, chunk_size: int) -> Iterator[pd.DataFrame]:
+        import pyarrow.parquet as pq
+
+        arquivo = pq.ParquetFile(file_path)
+        try:
+            inicio = 0
+            for batch in arquivo.iter_batches(batch_size=chunk_size):
+                df = batch.to_pandas()
+                df.columns = [str(c).strip() for c in df.columns]
+                df.index = pd.RangeIndex(inicio, inicio + len(df))
+                inicio += len(df)
+                yield df
+        finally:
+            arquivo.close()
+
+
+READERS = {
+    OpenpyxlStreamReader.nome: OpenpyxlStreamReader,
+    CalamineReader.nome: CalamineReader,
+    CsvReader.nome: CsvReader,
+    ParquetReader.nome: ParquetReader,
+}
+
+# Formatos não-planilha têm reader fixo pela extensão
+READER_POR_EXTENSAO = {
+    ".csv": CsvReader.nome,
+    ".csv.gz": CsvReader.nome,
+    ".parquet": ParquetReader.nome,
+}
+
+
+def escolher_reader(file_path: str) -> PlanilhaReader:
+    """
+    CSV/Parquet pela extensão; para .xlsx, engine fixa via settings.reader_engine
+    ou, em "auto", pelo tamanho do arquivo
+    """
+    nome = file_path.lower()
+    for ext, engine in READER_POR_EXTENSAO.items():
+        if nome.endswith(ext):
+            return READERS[engine]()
+
+    engine = settings.reader_engine
+    if engine == "auto":
+        limite = settings.reader_stream_threshold_mb * 1024 * 1024
+        engine = (OpenpyxlStreamReader.nome if os.path.getsize(file_path) > limite
+                  else CalamineReader.nome)
+
+    try:
+        return READERS[engine]()
+    except KeyError:
+        raise ValueError(f"reader_engine desconhecida: {engine}")
@@ -0,0 +1,173 @@
+import gzip
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+import orjson
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.metrics import (RETENCAO_DURACAO, RETENCAO_REMOVIDAS,
+                              RETENCAO_ULTIMA_EXECUCAO)
+from app.models.temp_models import (CompraTemp, ImpressaoPublicada,
+                                    LoteIngestao, OutboxMensagem)
+from app.services.payloads import compra_payload
+from app.workers.coordenacao import lideranca
+from sqlalchemy import delete, exists, select
+from sqlalchemy.orm import joinedload
+
+_retencao_thread = None
+
+
+def _arquivar(compras: list[CompraTemp]):
+    """Acrescenta as compras ao NDJSON gzip do dia (membros gzip concatenados)"""
+    os.makedirs(settings.retencao_arquivo_dir, exist_ok=True)
+    destino = os.path.join(
+        settings.retencao_arquivo_dir,
+        f"compras_{datetime.now().strftime('%Y%m%d')}.ndjson.gz")
+    linhas = b"".join(
+        orjson.dumps({**compra_payload(c), "lote_id": c.lote_id,
+                      "publicado_em": c.publicado_em},
+                     option=orjson.OPT_APPEND_NEWLINE)
+        for c in compras)
+    with gzip.open(destino, "ab") as f:
+        f.write(linhas)
+
+
+def purgar_compras(antes_de: datetime, limite: int) -> int:
+    """
+    Remove (e arquiva, se configurado) até `limite` compras publicadas antes de
+    `antes_de`, junto das suas mensagens da outbox. Uma transação curta por bloco.
+    """
+    with SessionLocal() as db:
+        with db.begin():
+            stmt = (
+                select(CompraTemp)
+                .where(CompraTemp.publicado_em.is_not(None),
+                       CompraTemp.publicado_em < antes_de)
+                .order_by(CompraTemp.id)
+                .limit(limite)
+            )
+            if settings.retencao_arquivo_dir:
+                stmt = stmt.options(
+                    joinedload(CompraTemp.cliente), joinedload(CompraTemp.produto))
+            compras = db.scalars(stmt).all()
+            if not compras:
+                return 0
+
+            if settings.retencao_arquivo_dir:
+                _arquivar(compras)
+
+            ids = [c.id for c in compras]
+            # Explícito: o SQLite não aplica ON DELETE CASCADE sem PRAGMA
+            removidas_outbox = db.execute(
+                delete(OutboxMensagem).where(OutboxMensagem.compra_id.in_(ids))
+                .execution_options(synchronize_session=False)).rowcount
+            db.execute(
+                delete(CompraTemp).where(CompraTemp.id.in_(ids))
+                .execution_options(synchronize_session=False))
+
+    RETENCAO_REMOVIDAS.labels("compras_temp").inc(len(ids))
+    RETENCAO_REMOVIDAS.labels("outbox_mensagens").inc(removidas_outbox)
+    return len(ids)
+
+
+def purgar_lotes(antes_de: datetime, limite: int) -> int:
+    """
+    Remove lotes concluídos antes de `antes_de` que já não têm compras.
+    Lotes com erro ou que falharam ficam: são o registro da ingestão que falhou.
+    """
+    with SessionLocal() as db:
+        with db.begin():
+            ids = db.scalars(
+                select(LoteIngestao.id)
+                .where(LoteIngestao.status == "concluido",
+                       LoteIngestao.finalizado_em < antes_de,
+                       ~exists().where(CompraTemp.lote_id == LoteIngestao.id))
+                .limit(limite)
+            ).all()
+            if ids:
+                db.execute(delete(LoteIngestao).where(LoteIngestao.id.in_(ids)))
+
+    RETENCAO_REMOVIDAS.labels("lotes_ingestao").inc(len(ids))
+    return len(ids)
+
+
+def purgar_impressoes(antes_de: datetime, limite: int) -> int:
+    """Esquece chaves de idempotência registradas antes de `antes_de`"""
+    with SessionLocal() as db:
+        with db.begin():
+            chaves = db.scalars(
+                select(ImpressaoPublicada.chave)
+                .where(ImpressaoPublicada.criado_em < antes_de)
+                .limit(limite)
+            ).all()
+            if chaves:
+                db.execute(delete(ImpressaoPublicada)
+                           .where(ImpressaoPublicada.chave.in_(chaves)))
+
+    RETENCAO_REMOVIDAS.labels("impressoes_publicadas").inc(len(chaves))
+    return len(chaves)
+
+
+def executar_retencao() -> dict:
+    """
+    Purga tudo o que passou de retencao_dias (chaves de dedup: dedup_janela_dias;
+    lotes: a mais longa das duas), em blocos de retencao_lote
+    """
+    inicio = time.perf_counter()
+    agora = datetime.now()
+    antes_de = agora - timedelta(days=settings.retencao_dias)
+    janela_dedup = agora - timedelta(days=settings.dedup_janela_dias)
+    totais = {"compras": 0, "lotes": 0, "impressoes": 0}
+
+    etapas = (
+        ("compras", purgar_compras, antes_de),
+        # O lote guarda a data_hora base do arquivo: enquanto as chaves de dedup
+        # existirem, o mesmo arquivo reenviado precisa dela para gerar as mesmas
+        ("lotes", purgar_lotes,
+         min(antes_de, janela_dedup) if settings.dedup_enabled else antes_de),
+        ("impressoes", purgar_impressoes, janela_dedup),
+    )
+    for chave, purgar, limite_data in etapas:
+        while True:
+            n = purgar(limite_data, settings.retencao_lote)
+            totais[chave] += n
+            if n < settings.retencao_lote:
+                break
+            # Folga entre blocos para não disputar o banco com a ingestão
+            time.sleep(settings.retencao_pausa)
+
+    RETENCAO_DURACAO.observe(time.perf_counter() - inicio)
+    RETENCAO_ULTIMA_EXECUCAO.set_to_current_time()
+    if totais["compras"] or totais["lotes"]:
+        print(
+            f"[RETENCAO] {totais['compras']} compras anteriores a "
+            f"{antes_de:%Y-%m-%d %H:%M} e {totais['lotes']} lotes concluídos removidos",
+            flush=True)
+    return totais
+
+
+def _loop_retencao():
+    # Com várias réplicas só a líder purga (as demais tentam assumir a cada ciclo)
+    lider = lideranca("ingestao.retencao")
+    while True:
+        try:
+            if lider.tentar():
+                executar_retencao()
+        except Exception as e:
+            print(f"[RETENCAO] Erro na retenção: {e}", flush=True)
+        time.sleep(settings.retencao_intervalo)
+
+
+def iniciar_retencao():
+    global _retencao_thread
+    if settings.retencao_dias <= 0:
+        print("[RETENCAO] Desativada (retencao_dias <= 0)", flush=True)
+        return
+    if _retencao_thread is None or not _retencao_thread.is_alive():
+        _retencao_thread = threading.Thread(target=_loop_retencao, daemon=True)
+        _retencao_thread.start()
+        print(
+            f"[RETENCAO] Job iniciado: compras publicadas há mais de "
+            f"{settings.retencao_dias} dias, a cada {settings.retencao_intervalo}s", flush=True)
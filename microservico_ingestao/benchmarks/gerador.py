@@ -0,0 +1,94 @@
+"""
+Gerador de arquivos sintéticos de vendas (mesmas colunas da ingestão).
+
+    python benchmarks/gerador.py vendas.parquet --linhas 100000 \\
+        [--duplicadas 0.05] [--clientes-repetidos 0.7] [--erros 0.01] [--seed 42]
+
+O formato sai da extensão (.xlsx, .csv, .csv.gz, .parquet). Com a mesma seed
+o arquivo gerado é sempre o mesmo.
+"""
+import argparse
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+FORMAS_PAGAMENTO = np.array(["PIX", "CARTAO", "BOLETO", "DINHEIRO"])
+
+
+def gerar_vendas(linhas: int, duplicadas: float = 0.0, clientes_repetidos: float = 0.5,
+                 erros: float = 0.0, produtos: int = 200, seed: int = 42) -> pd.DataFrame:
+    """
+    `duplicadas`: fração de linhas que repetem (idênticas) uma linha anterior.
+    `clientes_repetidos`: fração de linhas de um cliente que já apareceu antes.
+    `erros`: fração de linhas inválidas (quantidade 0 ou nome vazio).
+    """
+    rng = np.random.default_rng(seed)
+    pos = np.arange(linhas)
+
+    # Cliente novo ou sorteado entre os que já apareceram até a linha
+    novo = rng.random(linhas) >= clientes_repetidos
+    novo[:1] = True
+    vistos = np.cumsum(novo)
+    cliente = np.where(novo, vistos - 1, (rng.random(linhas) * vistos).astype("int64"))
+
+    df = pd.DataFrame({
+        "nome": [f"Cliente {c}" for c in cliente],
+        "email": [f"cliente{c}@exemplo.com" for c in cliente],
+        "telefone": (11900000000 + cliente).astype(str),
+        "endereco_completo": [f"Rua Sintética, {c}" for c in cliente],
+        "cpf_cnpj": (10000000000 + cliente).astype(str),
+        "produto": [f"Produto {p}" for p in rng.integers(0, produtos, linhas)],
+        "quantidade": rng.integers(1, 11, linhas),
+        "valor_unitario": np.round(rng.uniform(1, 500, linhas), 2),
+        "forma_pagamento": rng.choice(FORMAS_PAGAMENTO, linhas),
+        # data_hora própria: arquivos reenviados geram as mesmas chaves de dedup
+        "data_hora": pd.Timestamp(datetime(2024, 1, 1)) + pd.to_timedelta(pos, unit="s"),
+    })
+
+    # Cópia exata de uma linha anterior (cadeias resolvidas até a original)
+    origem = pos.copy()
+    repetir = rng.random(linhas) < duplicadas
+    repetir[:1] = False
+    origem[repetir] = (rng.random(int(repetir.sum())) * pos[repetir]).astype("int64")
+    while (origem[origem] != origem).any():
+        origem = origem[origem]
+    df = df.iloc[origem].reset_index(drop=True)
+
+    # Metade das inválidas sem nome, metade com quantidade 0
+    invalidas = np.flatnonzero(rng.random(linhas) < erros)
+    df.loc[invalidas[::2], "nome"] = None
+    df.loc[invalidas[1::2], "quantidade"] = 0
+    return df
+
+
+def salvar(df: pd.DataFrame, path: str):
+    nome = path.lower()
+    if nome.endswith(".xlsx"):
+        df.to_excel(path, index=False)
+    elif nome.endswith((".csv", ".csv.gz")):
+        df.to_csv(path, index=False)
+    elif nome.endswith(".parquet"):
+        df.to_parquet(path, index=False)
+    else:
+        raise ValueError(f"Formato não suportado: {path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("saida")
+    parser.add_argument("--linhas", type=int, default=10_000)
+    parser.add_argument("--duplicadas", type=float, default=0.0)
+    parser.add_argument("--clientes-repetidos", type=float, default=0.5)
+    parser.add_argument("--erros", type=float, default=0.0)
+    parser.add_argument("--produtos", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    salvar(gerar_vendas(args.linhas, args.duplicadas, args.clientes_repetidos,
+                        args.erros, args.produtos, args.seed), args.saida)
+    print(f"{args.linhas} linhas -> {args.saida}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Vazão da ingestão de arquivos (process_excel + relay da outbox), por formato.
+
+    python benchmarks/ingestao.py [--linhas 50000] [--formatos xlsx,csv,parquet]
+        [--duplicadas 0.05] [--clientes-repetidos 0.7] [--erros 0.01]
+        [--execucoes 3] [--database-url URL] [--saida resultado.json]
+
+Cada execução roda num processo novo, com banco recriado e broker em memória
+(memory://): mede leitura, normalização, gravação e publicação, linhas/s e
+pico de RSS. Sem --database-url usa um SQLite temporário; com ele, só aceita
+banco local (localhost) e descartável, pois as tabelas são recriadas.
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from gerador import gerar_vendas, salvar
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+EXTENSOES = {"xlsx": ".xlsx", "csv": ".csv", "csv.gz": ".csv.gz", "parquet": ".parquet"}
+
+_EXECUTAR = """
+import json, resource, sys, time
+from app.core import database
+import app.models.temp_models
+database.Base.metadata.drop_all(database.engine)
+database.init_db()
+from app.workers.file_watcher import process_excel
+from app.workers.outbox_relay import drenar_outbox
+
+resumo = process_excel(sys.argv[1])
+if resumo["status"] != "concluido":
+    raise SystemExit(resumo.get("erro"))
+t = time.perf_counter()
+publicadas = 0
+while (n := drenar_outbox()):
+    publicadas += n
+resumo["etapas"]["publicacao"] = time.perf_counter() - t
+resumo["publicadas"] = publicadas
+# ru_maxrss em KiB no Linux
+resumo["pico_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+print(json.dumps(resumo))
+"""
+
+
+def _validar_banco(url: str):
+    from sqlalchemy.engine import make_url
+
+    destino = make_url(url)
+    if destino.get_backend_name() != "sqlite" and destino.host not in ("localhost", "127.0.0.1"):
+        raise SystemExit(
+            f"--database-url deve ser um banco local descartável (host={destino.host})")
+
+
+def _ambiente(pasta: str, database_url: str | None) -> dict:
+    env = dict(os.environ)
+    env["DATABASE_URL"] = database_url or f"sqlite:///{os.path.join(pasta, 'bench.db')}"
+    env["RABBITMQ_URL"] = "memory://"
+    env["DATA_PATH"] = os.path.join(pasta, "data")
+    env["PYTHONPATH"] = RAIZ + os.pathsep + env.get("PYTHONPATH", "")
+    return env
+
+
+def _executar(arquivo: str, pasta: str, database_url: str | None) -> dict:
+    env = _ambiente(pasta, database_url)
+    os.makedirs(env["DATA_PATH"], exist_ok=True)
+    # process_excel move o arquivo para processed/: cada execução usa uma cópia
+    entrada = shutil.copy(arquivo, env["DATA_PATH"])
+
+    saida = subprocess.run(
+        [sys.executable, "-c", _EXECUTAR, entrada], cwd=RAIZ, env=env,
+        capture_output=True, text=True)
+    if saida.returncode != 0:
+        raise SystemExit(f"Falha ao processar {arquivo}:\n{saida.stderr[-2000:]}")
+    resumo = json.loads(saida.stdout.strip().splitlines()[-1])
+
+    etapas = {k: round(v, 4) for k, v in resumo["etapas"].items()}
+    ponta_a_ponta = resumo["duracao"] + resumo["etapas"]["publicacao"]
+    return {
+        "linhas": resumo["linhas"],
+        "compras": resumo["compras"],
+        "rejeitadas": resumo["rejeitadas"],
+        "duplicadas": resumo["duplicadas"],
+        "publicadas": resumo["publicadas"],
+        "duracao_s": round(resumo["duracao"], 4),
+        "linhas_por_segundo": round(resumo["linhas"] / resumo["duracao"], 1),
+        "ponta_a_ponta_linhas_por_segundo": round(resumo["linhas"] / ponta_a_ponta, 1),
+        "pico_rss_mb": round(resumo["pico_rss_mb"], 1),
+        "etapas": etapas,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--linhas", type=int, default=50_000)
+    parser.add_argument("--formatos", default="xlsx,csv,parquet")
+    parser.add_argument("--duplicadas", type=float, default=0.05)
+    parser.add_argument("--clientes-repetidos", type=float, default=0.7)
+    parser.add_argument("--erros", type=float, default=0.01)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--execucoes", type=int, default=1)
+    parser.add_argument("--database-url")
+    parser.add_argument("--saida", help="grava o JSON também neste arquivo")
+    args = parser.parse_args()
+
+    formatos = [f.strip() for f in args.formatos.split(",") if f.strip()]
+    desconhecidos = set(formatos) - set(EXTENSOES)
+    if desconhecidos:
+        raise SystemExit(f"Formatos desconhecidos: {sorted(desconhecidos)}")
+    if args.database_url:
+        _validar_banco(args.database_url)
+
+    vendas = gerar_vendas(args.linhas, args.duplicadas, args.clientes_repetidos,
+                          args.erros, seed=args.seed)
+    resultado = {
+        "python": sys.version.split()[0],
+        "banco": args.database_url.split(":", 1)[0] if args.database_url else "sqlite",
+        "parametros": {"linhas": args.linhas, "duplicadas": args.duplicadas,
+                       "clientes_repetidos": args.clientes_repetidos,
+                       "erros": args.erros, "seed": args.seed,
+                       "execucoes": args.execucoes},
+        "formatos": {},
+    }
+
+    with tempfile.TemporaryDirectory(prefix="bench_ingestao_") as pasta:
+        for formato in formatos:
+            arquivo = os.path.join(pasta, f"vendas{EXTENSOES[formato]}")
+            salvar(vendas, arquivo)
+            execucoes = [_executar(arquivo, pasta, args.database_url)
+                         for _ in range(args.execucoes)]
+            resultado["formatos"][formato] = {
+                "tamanho_mb": round(os.path.getsize(arquivo) / 2**20, 2),
+                "mediana_linhas_por_segundo": round(statistics.median(
+                    e["linhas_por_segundo"] for e in execucoes), 1),
+                "execucoes": execucoes,
+            }
+
+    texto = json.dumps(resultado, indent=2, ensure_ascii=False)
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            f.write(texto + "\n")
+    print(texto)
+
+
+if __name__ == "__main__":
+    main()
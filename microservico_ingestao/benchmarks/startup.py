@@ -0,0 +1,101 @@
+"""
+Tempo de cold start da API de ingestão, medido em processos Python novos.
+
+    python benchmarks/startup.py [--execucoes 10] [--importtime]
+
+Para cada execução mede "importar" (import app.main) e "primeira_resposta"
+(import + lifespan + GET /openapi.json). No lifespan ficam desligados o
+watcher, a retenção e a criação do schema; relay e coordenação sobem como em
+qualquer réplica. A pasta de dados é temporária.
+Imprime JSON com mediana/mín/máx em ms e, com --importtime, os módulos
+mais caros segundo `python -X importtime`.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_IMPORTAR = """
+import time
+t = time.perf_counter()
+import app.main
+print((time.perf_counter() - t) * 1000)
+"""
+
+_PRIMEIRA_RESPOSTA = """
+import time
+t = time.perf_counter()
+from app.main import app
+from fastapi.testclient import TestClient
+with TestClient(app) as c:
+    c.get("/openapi.json").raise_for_status()
+print((time.perf_counter() - t) * 1000)
+"""
+
+
+def _ambiente(pasta: str) -> dict:
+    env = dict(os.environ)
+    env.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(pasta, 'startup.db')}")
+    env.setdefault("RABBITMQ_URL", "memory://")
+    # O import de app.main cria as subpastas de DATA_PATH
+    env["DATA_PATH"] = os.path.join(pasta, "data")
+    # Mede a API; watcher, retenção e schema ficam fora do caminho
+    env.setdefault("WATCHER_ENABLED", "false")
+    env.setdefault("DB_INIT_ON_STARTUP", "false")
+    env.setdefault("RETENCAO_DIAS", "0")
+    env["PYTHONPATH"] = RAIZ + os.pathsep + env.get("PYTHONPATH", "")
+    return env
+
+
+def _medir(codigo: str, execucoes: int, pasta: str) -> dict:
+    amostras = []
+    for _ in range(execucoes):
+        saida = subprocess.run(
+            [sys.executable, "-c", codigo], cwd=RAIZ, env=_ambiente(pasta),
+            capture_output=True, text=True, check=True).stdout
+        amostras.append(float(saida.strip().splitlines()[-1]))
+    return {"mediana_ms": round(statistics.median(amostras), 1),
+            "min_ms": round(min(amostras), 1), "max_ms": round(max(amostras), 1)}
+
+
+def _importtime(pasta: str, limite: int = 15) -> list[dict]:
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"], cwd=RAIZ,
+        env=_ambiente(pasta), capture_output=True, text=True, check=True).stderr
+    modulos = []
+    for linha in stderr.splitlines():
+        if not linha.startswith("import time:") or "|" not in linha:
+            continue
+        _, cumulativo, nome = linha.split("|")
+        # Dois espaços por nível de aninhamento; nível 1 = imports diretos
+        nivel = (len(nome) - len(nome.lstrip()) - 1) // 2
+        if nivel == 1 and cumulativo.strip().isdigit():
+            modulos.append({"modulo": nome.strip(), "ms": int(cumulativo) / 1000})
+    return sorted(modulos, key=lambda m: -m["ms"])[:limite]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--execucoes", type=int, default=10)
+    parser.add_argument("--importtime", action="store_true")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="bench_startup_") as pasta:
+        resultado = {
+            "python": sys.version.split()[0],
+            "execucoes": args.execucoes,
+            "importar": _medir(_IMPORTAR, args.execucoes, pasta),
+            "primeira_resposta": _medir(_PRIMEIRA_RESPOSTA, args.execucoes, pasta),
+        }
+        if args.importtime:
+            resultado["modulos"] = _importtime(pasta)
+    print(json.dumps(resultado, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
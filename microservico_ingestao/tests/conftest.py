@@ -0,0 +1,61 @@
+"""
+Ambiente isolado dos testes: SQLite e pasta de dados temporários e broker
+em memória (memory://). Definido antes de qualquer import de app.*, pois
+settings e engines são criados no import.
+"""
+import os
+import tempfile
+
+import pytest
+
+_PASTA = tempfile.mkdtemp(prefix="ingestao_testes_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_PASTA, 'testes.db')}"
+os.environ["RABBITMQ_URL"] = "memory://"
+os.environ["DATA_PATH"] = os.path.join(_PASTA, "data")
+
+
+@pytest.fixture
+def banco():
+    """Schema recriado e caches de lookup vazios (ids do banco anterior)"""
+    from app.core import database
+    from app.services import cache
+
+    import app.models.temp_models  # noqa: F401
+
+    database.Base.metadata.drop_all(database.engine)
+    database.init_db()
+    for lru in (cache.clientes_por_cpf, cache.clientes_por_nome, cache.produtos_por_nome):
+        lru.limpar()
+    return database.SessionLocal
+
+
+@pytest.fixture
+def arquivo_vendas():
+    """Grava o DataFrame como CSV na pasta monitorada (mesmo df -> mesmo conteúdo)"""
+    from app.workers.arquivos import DATA_PATH
+
+    def gravar(df, nome="vendas.csv"):
+        destino = os.path.join(DATA_PATH, nome)
+        df.to_csv(destino, index=False)
+        return destino
+
+    return gravar
+
+
+def vendas(linhas: int, **colunas):
+    """Vendas válidas no formato do arquivo de ingestão (sem data_hora)"""
+    import pandas as pd
+
+    dados = {
+        "nome": [f"Cliente {i}" for i in range(linhas)],
+        "email": [f"cliente{i}@exemplo.com" for i in range(linhas)],
+        "telefone": [f"119{i:08d}" for i in range(linhas)],
+        "endereco_completo": [f"Rua Teste, {i}" for i in range(linhas)],
+        "cpf_cnpj": [f"{10000000000 + i}" for i in range(linhas)],
+        "produto": [f"Produto {i % 7}" for i in range(linhas)],
+        "quantidade": [i % 5 + 1 for i in range(linhas)],
+        "valor_unitario": [round(10 + i * 0.25, 2) for i in range(linhas)],
+        "forma_pagamento": ["PIX"] * linhas,
+    }
+    dados.update(colunas)
+    return pd.DataFrame(dados)
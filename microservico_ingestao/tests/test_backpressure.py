@@ -0,0 +1,128 @@
+"""
+Transições do backpressure do relay (ControleVazao) contra o broker memory://
+do conftest: a profundidade vem de profundidade_fila e a fila é enchida com
+publish_many e esvaziada por um consumidor kombu.
+
+    python -m pytest tests   (a partir de microservico_ingestao/)
+"""
+import pytest
+
+from app.core.config import settings
+from app.tasks import publisher
+from app.tasks.publisher import ROUTING, celery_client, profundidade_fila, publish_many
+from app.workers.backpressure import ControleVazao
+
+
+def _esvaziar(ate: int = 0):
+    """Consome mensagens até a fila ficar com `ate`"""
+    with celery_client.connection_or_acquire() as conn:
+        fila = conn.SimpleQueue(ROUTING["queue"])
+        try:
+            for _ in range(profundidade_fila() - ate):
+                fila.get(timeout=1).ack()
+        finally:
+            fila.close()
+
+
+def _encher(ate: int):
+    """Publica um lote por mensagem até a fila ficar com `ate`"""
+    faltam = ate - profundidade_fila()
+    assert all(publish_many([[{"id": i}] for i in range(faltam)]))
+
+
+@pytest.fixture
+def fila(monkeypatch):
+    monkeypatch.setattr(settings, "backpressure_enabled", True)
+    monkeypatch.setattr(settings, "backpressure_high_water", 20)
+    monkeypatch.setattr(settings, "backpressure_low_water", 4)
+    monkeypatch.setattr(settings, "backpressure_check_interval", 0)
+    _esvaziar()
+    yield
+    _esvaziar()
+
+
+def _avaliar(controle: ControleVazao, profundidade: int) -> float:
+    if profundidade >= profundidade_fila():
+        _encher(profundidade)
+    else:
+        _esvaziar(profundidade)
+    assert profundidade_fila() == profundidade
+    return controle.avaliar()
+
+
+def test_normal_abaixo_de_low_water(fila):
+    controle = ControleVazao()
+
+    assert _avaliar(controle, 0) == 1.0
+    assert _avaliar(controle, 4) == 1.0
+    snapshot = controle.snapshot()
+    assert (snapshot["estado"], snapshot["profundidade"]) == ("normal", 4)
+
+
+def test_reduzido_proporcional_a_folga(fila):
+    controle = ControleVazao()
+
+    assert _avaliar(controle, 12) == pytest.approx(0.5)
+    assert controle.snapshot()["estado"] == "reduzido"
+    # Perto do limite a vazão não cai abaixo do mínimo
+    assert _avaliar(controle, 19) == ControleVazao.FATOR_MINIMO
+
+
+def test_pausa_em_high_water_e_retoma_so_em_low_water(fila):
+    controle = ControleVazao()
+
+    assert _avaliar(controle, 20) == 0.0
+    snapshot = controle.snapshot()
+    assert (snapshot["estado"], snapshot["pausas"]) == ("pausado", 1)
+
+    # Histerese: entre low_water e high_water continua pausado
+    assert _avaliar(controle, 12) == 0.0
+    assert _avaliar(controle, 5) == 0.0
+    assert controle.snapshot()["estado"] == "pausado"
+
+    assert _avaliar(controle, 4) == 1.0
+    snapshot = controle.snapshot()
+    assert (snapshot["estado"], snapshot["pausas"]) == ("normal", 1)
+    assert controle.pausado_desde is None
+    assert controle.tempo_pausado > 0
+
+    # Depois de retomar, volta a reduzir sem pausar de novo
+    assert _avaliar(controle, 12) == pytest.approx(0.5)
+    assert _avaliar(controle, 25) == 0.0
+    assert controle.snapshot()["pausas"] == 2
+
+
+def test_erro_na_leitura_nao_pausa(fila, monkeypatch):
+    controle = ControleVazao()
+
+    def broker_fora():
+        raise ConnectionError("broker fora")
+
+    with monkeypatch.context() as m:
+        m.setattr(publisher.celery_client, "connection_or_acquire", broker_fora)
+        assert controle.avaliar() == 1.0
+    snapshot = controle.snapshot()
+    assert snapshot["estado"] == "normal"
+    assert snapshot["profundidade"] is None
+    assert "ConnectionError" in snapshot["erro"]
+
+    assert _avaliar(controle, 20) == 0.0
+    assert controle.snapshot()["erro"] is None
+
+
+def test_profundidade_lida_no_maximo_uma_vez_por_intervalo(fila, monkeypatch):
+    monkeypatch.setattr(settings, "backpressure_check_interval", 3600)
+    controle = ControleVazao()
+
+    assert _avaliar(controle, 20) == 0.0
+    # Leitura ainda válida: a fila esvaziou, mas o relay segue pausado
+    assert _avaliar(controle, 0) == 0.0
+    assert controle.profundidade == 20
+
+
+def test_desativado_libera_vazao_total(fila, monkeypatch):
+    monkeypatch.setattr(settings, "backpressure_enabled", False)
+    controle = ControleVazao()
+
+    assert _avaliar(controle, 25) == 1.0
+    assert controle.snapshot()["estado"] == "desativado"
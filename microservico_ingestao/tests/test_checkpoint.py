@@ -0,0 +1,36 @@
+from conftest import vendas
+from sqlalchemy import func, select
+
+from app.core.config import settings
+from app.models.temp_models import CompraTemp, LoteIngestao
+from app.workers import file_watcher
+
+
+def test_retoma_do_ultimo_bloco_confirmado(banco, arquivo_vendas, monkeypatch):
+    monkeypatch.setattr(settings, "reader_chunk_size", 5)
+    monkeypatch.setattr(settings, "ingest_max_tentativas", 3)
+    registrar_vendas = file_watcher.registrar_vendas
+    chamadas = []
+
+    def falhar_no_segundo_bloco(*args, **kwargs):
+        chamadas.append(1)
+        if len(chamadas) == 2:
+            raise RuntimeError("banco fora")
+        return registrar_vendas(*args, **kwargs)
+
+    path = arquivo_vendas(vendas(12))
+    with monkeypatch.context() as m:
+        m.setattr(file_watcher, "registrar_vendas", falhar_no_segundo_bloco)
+        primeiro = file_watcher.process_excel(path)
+    assert (primeiro["status"], primeiro["tentativas"]) == ("erro", 1)
+
+    segundo = file_watcher.process_excel(path)
+
+    assert segundo["lote_id"] == primeiro["lote_id"]
+    assert (segundo["status"], segundo["retomado_de"]) == ("concluido", 5)
+    assert (segundo["linhas"], segundo["compras"], segundo["duplicadas"]) == (7, 7, 0)
+    with banco() as db:
+        lote = db.scalars(select(LoteIngestao)).one()
+        assert (lote.linhas_processadas, lote.total_compras, lote.tentativas) == (12, 12, 2)
+        # Sem linha repetida nem perdida: cada compra com a sua data_hora
+        assert db.scalar(select(func.count(func.distinct(CompraTemp.data_hora)))) == 12
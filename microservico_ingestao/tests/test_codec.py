@@ -0,0 +1,47 @@
+"""Vetor de teste do formato de processed_data (mesmos bytes dos dois lados)"""
+import importlib.util
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from pathlib import Path
+
+import pytest
+from app.tasks import codec
+
+_DISTRIB = (Path(__file__).resolve().parents[2]
+            / "microservico_distribuicao" / "distrib" / "workers" / "codec.py")
+
+MENSAGEM = {
+    "v": Decimal("12.50"),
+    "n": datetime(2024, 1, 2, 3, 4, 5, 6),
+    "a": datetime(2024, 1, 2, 3, 4, 5, tzinfo=timezone(timedelta(hours=-3))),
+}
+BYTES = bytes.fromhex(
+    "0083a176c7050131322e3530a16ec70c0200060dedc04dd34680000000"
+    "a161c70c0200060df04408bf40ffffd5d0")
+
+
+def _codec_distrib():
+    if not _DISTRIB.exists():
+        pytest.skip("microservico_distribuicao fora da árvore")
+    spec = importlib.util.spec_from_file_location("distrib_codec", _DISTRIB)
+    modulo = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(modulo)
+    return modulo
+
+
+@pytest.mark.parametrize("lado", ["ingestao", "distribuicao"])
+def test_vetor_fixo(lado):
+    c = codec if lado == "ingestao" else _codec_distrib()
+    assert c.encode(MENSAGEM) == BYTES
+    assert c.decode(BYTES) == MENSAGEM
+    assert c.decode(BYTES)["a"].utcoffset() == timedelta(hours=-3)
+    assert c.decode(BYTES)["n"].tzinfo is None
+
+
+def test_comprimido_decodifica_no_outro_lado():
+    distrib = _codec_distrib()
+    lista = [MENSAGEM] * 200
+    corpo = codec.encode(lista, compress_min_bytes=64)
+    assert corpo[:1] == b"\x01"
+    assert distrib.decode(corpo) == lista
+    assert codec.decode(distrib.encode(lista, compress_min_bytes=64)) == lista
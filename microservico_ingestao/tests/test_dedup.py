@@ -0,0 +1,37 @@
+from conftest import vendas
+from sqlalchemy import func, select
+
+from app.models.temp_models import CompraTemp, LoteIngestao, OutboxMensagem
+from app.workers.file_watcher import process_excel
+
+
+def _contar(db, modelo):
+    return db.scalar(select(func.count()).select_from(modelo))
+
+
+def test_arquivo_reenviado_nao_gera_compras_novas(banco, arquivo_vendas):
+    df = vendas(120)
+
+    primeiro = process_excel(arquivo_vendas(df))
+    assert (primeiro["status"], primeiro["compras"], primeiro["duplicadas"]) == ("concluido", 120, 0)
+
+    segundo = process_excel(arquivo_vendas(df))
+    assert (segundo["status"], segundo["compras"], segundo["duplicadas"]) == ("concluido", 0, 120)
+
+    with banco() as db:
+        assert _contar(db, CompraTemp) == 120
+        assert _contar(db, OutboxMensagem) == 120
+        lotes = db.scalars(select(LoteIngestao).order_by(LoteIngestao.criado_em)).all()
+        assert len(lotes) == 2
+        assert lotes[0].data_hora_base == lotes[1].data_hora_base
+
+
+def test_linhas_repetidas_no_mesmo_arquivo_sao_duplicadas(banco, arquivo_vendas):
+    df = vendas(10)
+    # data_hora própria igual: mesma chave de idempotência nas duas linhas
+    df["data_hora"] = "2024-01-01 10:00:00"
+    df = df.iloc[[0, 1, 2, 2]]
+
+    resumo = process_excel(arquivo_vendas(df))
+
+    assert (resumo["compras"], resumo["duplicadas"]) == (3, 1)
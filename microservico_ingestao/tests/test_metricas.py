@@ -0,0 +1,40 @@
+import time
+
+from conftest import vendas
+from prometheus_client import REGISTRY
+
+from app.core.config import settings
+from app.workers import file_watcher
+from app.workers.pool import PoolIngestao
+
+
+def _linhas(resultado: str) -> float:
+    return REGISTRY.get_sample_value("ingest_linhas_total", {"resultado": resultado}) or 0.0
+
+
+def test_linhas_de_blocos_gravados_contam_mesmo_com_falha_depois(banco, arquivo_vendas, monkeypatch):
+    monkeypatch.setattr(settings, "reader_chunk_size", 5)
+    monkeypatch.setattr(settings, "ingest_max_tentativas", 1)
+    registrar_vendas = file_watcher.registrar_vendas
+    chamadas = []
+
+    def falhar_no_segundo_bloco(*args, **kwargs):
+        chamadas.append(1)
+        if len(chamadas) == 2:
+            raise RuntimeError("banco fora")
+        return registrar_vendas(*args, **kwargs)
+
+    monkeypatch.setattr(file_watcher, "registrar_vendas", falhar_no_segundo_bloco)
+    df = vendas(10)
+    df.loc[1, "nome"] = None
+    antes = {r: _linhas(r) for r in ("aceita", "rejeitada")}
+
+    resumo = PoolIngestao(workers=1, modo="thread").submeter(arquivo_vendas(df)).result(timeout=30)
+
+    assert resumo["status"] == "falhou"
+    # O progresso (e as métricas de bloco) chega pela fila, em outra thread
+    limite = time.monotonic() + 5
+    while _linhas("aceita") == antes["aceita"] and time.monotonic() < limite:
+        time.sleep(0.05)
+    assert _linhas("aceita") - antes["aceita"] == 4
+    assert _linhas("rejeitada") - antes["rejeitada"] == 1
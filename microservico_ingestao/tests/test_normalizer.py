@@ -0,0 +1,65 @@
+import pandas as pd
+from conftest import vendas
+
+from app.workers.normalizer import (QUANTIDADE_MAXIMA, VALOR_MAXIMO,
+                                    normalizar_vendas)
+
+
+def _motivos(df: pd.DataFrame) -> dict:
+    validas, rejeitadas = normalizar_vendas(df)
+    assert len(validas) + len(rejeitadas) == len(df)
+    return dict(zip(rejeitadas["linha"], rejeitadas["motivo"]))
+
+
+def test_linhas_validas_normalizadas():
+    df = vendas(3)
+    df.loc[0, "nome"] = "  Cliente 0  "
+    df.loc[1, "forma_pagamento"] = None
+
+    validas, rejeitadas = normalizar_vendas(df)
+
+    assert rejeitadas.empty
+    assert validas.loc[0, "nome"] == "Cliente 0"
+    assert validas.loc[1, "forma_pagamento"] == "OUTROS"
+    assert validas["quantidade"].dtype == "int64"
+    assert (validas["valor_total"] == validas["quantidade"] * validas["valor_unitario"]).all()
+
+
+def test_quantidade_precisa_ser_inteira_positiva_e_caber_em_int32():
+    df = vendas(7).astype({"quantidade": object})
+    df["quantidade"] = [1, 0.5, 1e30, 3e9, -2, "abc", QUANTIDADE_MAXIMA]
+    df["valor_unitario"] = 1.0
+
+    assert _motivos(df) == {
+        1: "quantidade deve ser inteira",
+        2: f"quantidade acima de {QUANTIDADE_MAXIMA}",
+        3: f"quantidade acima de {QUANTIDADE_MAXIMA}",
+        4: "quantidade deve ser > 0",
+        5: "quantidade inválida",
+    }
+
+
+def test_valores_fora_da_faixa_vao_para_quarentena():
+    df = vendas(6)
+    df["quantidade"] = [1, 1, 1, 1, 2, 1]
+    df["valor_unitario"] = [0, -1, 1e10, float("inf"), VALOR_MAXIMO / 2, 9_999_999_999.99]
+
+    assert _motivos(df) == {
+        1: "valor_unitario negativo",
+        2: f"valor_unitario acima de {VALOR_MAXIMO}",
+        3: "valor_unitario inválido",
+        4: f"valor_total acima de {VALOR_MAXIMO}",
+    }
+
+
+def test_campos_obrigatorios_e_tamanho_maximo():
+    df = vendas(3)
+    df.loc[0, "nome"] = "   "
+    df.loc[1, "produto"] = None
+    df.loc[2, "cpf_cnpj"] = "1" * 21
+
+    assert _motivos(df) == {
+        0: "nome vazio",
+        1: "produto vazio",
+        2: "cpf_cnpj excede 20 caracteres",
+    }
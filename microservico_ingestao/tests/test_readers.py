@@ -0,0 +1,42 @@
+import pandas as pd
+import pytest
+from conftest import vendas
+from openpyxl import load_workbook
+from openpyxl.styles import PatternFill
+
+from app.workers.readers import READERS
+
+
+@pytest.fixture
+def planilha_com_linhas_formatadas(tmp_path):
+    """4 vendas, uma linha vazia no meio e 5 linhas vazias só com formatação no fim"""
+    path = tmp_path / "vendas.xlsx"
+    df = vendas(4)
+    pd.concat([df.iloc[:2], df.iloc[:0].reindex([0]), df.iloc[2:]]).to_excel(path, index=False)
+
+    wb = load_workbook(path)
+    ws = wb.active
+    for linha in range(ws.max_row + 1, ws.max_row + 6):
+        ws.cell(row=linha, column=1).fill = PatternFill("solid", fgColor="FFFF00")
+    wb.save(path)
+    return str(path)
+
+
+@pytest.mark.parametrize("engine", ["openpyxl_stream", "calamine"])
+def test_linhas_vazias_nao_chegam_ao_normalizador(planilha_com_linhas_formatadas, engine):
+    blocos = list(READERS[engine]().ler(planilha_com_linhas_formatadas, chunk_size=2))
+
+    lido = pd.concat(blocos)
+    assert len(lido) == 4
+    assert list(lido["nome"]) == [f"Cliente {i}" for i in range(4)]
+
+
+def test_csv_pula_linhas_so_com_separadores(tmp_path):
+    path = tmp_path / "vendas.csv"
+    vendas(3).to_csv(path, index=False)
+    with open(path, "a") as f:
+        f.write(",,,,,,,,\n\n,,,,,,,,\n")
+
+    lido = pd.concat(READERS["csv"]().ler(str(path), chunk_size=2))
+
+    assert len(lido) == 3
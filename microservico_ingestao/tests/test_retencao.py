@@ -0,0 +1,42 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+
+from app.models.temp_models import LoteIngestao
+from app.workers.retencao import purgar_lotes
+
+
+def test_purga_so_lotes_concluidos(banco):
+    antigo = datetime.now() - timedelta(days=30)
+    with banco() as db:
+        for status in ("concluido", "erro", "falhou"):
+            db.add(LoteIngestao(id=status, arquivo=f"{status}.csv", status=status,
+                                finalizado_em=antigo))
+        db.add(LoteIngestao(id="recente", arquivo="recente.csv", status="concluido",
+                            finalizado_em=datetime.now()))
+        db.commit()
+
+    assert purgar_lotes(datetime.now() - timedelta(days=7), limite=100) == 1
+
+    with banco() as db:
+        restantes = set(db.scalars(select(LoteIngestao.id)))
+    assert restantes == {"erro", "falhou", "recente"}
+
+
+def test_lote_fica_enquanto_a_janela_de_dedup_lembra_as_chaves(banco, monkeypatch):
+    from app.core.config import settings
+    from app.workers.retencao import executar_retencao
+
+    monkeypatch.setattr(settings, "retencao_dias", 7)
+    monkeypatch.setattr(settings, "dedup_janela_dias", 30)
+    monkeypatch.setattr(settings, "retencao_pausa", 0)
+    with banco() as db:
+        for id_, dias in (("dentro", 20), ("fora", 40)):
+            db.add(LoteIngestao(id=id_, arquivo=f"{id_}.csv", status="concluido",
+                                finalizado_em=datetime.now() - timedelta(days=dias)))
+        db.commit()
+
+    assert executar_retencao()["lotes"] == 1
+
+    with banco() as db:
+        assert set(db.scalars(select(LoteIngestao.id))) == {"dentro"}